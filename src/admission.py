@@ -0,0 +1,93 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class Overloaded(Exception):
+    """
+    Raised when a gate has no room. `fallback` carries the best answer the
+    cheap stages produced, if any, so callers can degrade instead of failing.
+    """
+
+    def __init__(self, reason: str, retry_after: float, fallback: Optional[str] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.fallback = fallback
+
+
+class Gate:
+    """
+    Bounded concurrency with a bounded wait queue.
+
+    At most `limit` callers hold the gate at once; up to `max_queue` more
+    wait for at most `timeout` seconds. Anyone beyond that, or anyone who
+    waits too long, gets Overloaded straight away, so admitted work keeps
+    predictable latency instead of everybody queueing behind everybody.
+    A limit of 0 disables the gate.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int = 0, timeout: float = 0.0, retry_after: float = 1.0):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        if self.limit <= 0:
+            return
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(f"{self.name}: {self.active} active, queue full", self.retry_after)
+
+            self.waiting += 1
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise Overloaded(f"{self.name}: no slot within {self.timeout * 1000:.0f} ms", self.retry_after)
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        if self.limit <= 0:
+            return
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
@@ -0,0 +1,166 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+_STOP = object()
+
+
+class ActivityCounter:
+    """Number of requests currently inside a `with counter:` block."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.value += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.value -= 1
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batching for single-text encode calls.
+
+    Callers on any thread `submit` a text and wait on the returned future.
+    A background thread collects texts that arrive within `max_wait_ms` of
+    the first one (up to `max_batch_size`), runs one batched forward pass
+    and hands every caller its own row.
+
+    `active`, if given, returns how many requests could still join: once the
+    batch holds that many texts it is sent without waiting out the window,
+    so a lone request is not delayed. A count of 0 means the caller is not
+    tracked (replay, a direct encode_query) and the full window applies.
+
+    `concurrency` background threads collect and encode batches side by
+    side, for an `encode_batch` that can run several at once (a pool of
+    embedding processes).
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 active: Optional[Callable[[], int]] = None, concurrency: int = 1):
+        self.encode_batch = encode_batch
+        self.active = active
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.concurrency = max(1, concurrency)
+        self._queue = queue.Queue()
+        self._threads = []
+        # Held while texts are queued and while stop() drains, so no future is left behind.
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        with self._submit_lock:
+            if not self.running:
+                self._queue = queue.Queue()
+                self._threads = [
+                    threading.Thread(target=self._run, name=f"embedding-batcher-{i}", daemon=True)
+                    for i in range(self.concurrency)
+                ]
+                for thread in self._threads:
+                    thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the threads and fail every text still queued, so no caller waits forever."""
+        with self._submit_lock:
+            threads, self._threads = self._threads, []
+            # Every thread puts the marker back on its way out for the next one.
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join(timeout)
+        self._fail_queued(RuntimeError("embedding batcher stopped"))
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        with self._submit_lock:
+            if not self._threads:
+                future.set_exception(RuntimeError("embedding batcher is not running"))
+            else:
+                self._queue.put((text, future))
+        return future
+
+    def _fail_queued(self, error: Exception):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and not item[1].done():
+                item[1].set_exception(error)
+        # A thread that outlived the join still needs the marker to exit.
+        self._queue.put(_STOP)
+
+    def encode(self, text: str, timeout: float = None) -> np.ndarray:
+        return self.submit(text).result(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "largest_batch": self.largest_batch,
+            "mean_batch": self.items / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if self.active is not None and self._queue.empty():
+                active = self.active()
+                if 0 < active <= len(batch):
+                    break
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.put(_STOP)
+                return
+            batch = self._collect(first)
+
+            # Identical texts in one window share a row.
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = self.encode_batch(unique)
+                rows = dict(zip(unique, vectors))
+                for text, future in batch:
+                    future.set_result(rows[text])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
@@ -0,0 +1,201 @@
+import sys, os
+import re
+import math
+import zlib
+import random
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import UPSERT_FILE, CASCADE_THRESHOLD, CASCADE_SHADOW_RATE
+from src.entities import ADDRESS_PATTERN, AMOUNT_PATTERN, DOMAIN_PATTERN
+from src.vector_index import load_examples
+
+
+N_FEATURES = 1 << 18
+TEMPERATURE = 0.05
+
+_WORD = re.compile(r"[a-z0-9<>$]+")
+
+
+def _features(text: str) -> Dict[int, float]:
+    """L2-normalized hashed char 2-4-grams, words and word bigrams."""
+    text = ADDRESS_PATTERN.sub(" <addr> ", text)
+    text = DOMAIN_PATTERN.sub(" <domain> ", text)
+    text = AMOUNT_PATTERN.sub("0", text.lower())
+    words = _WORD.findall(text)
+
+    counts: Dict[int, float] = {}
+
+    def add(feature: str):
+        h = zlib.crc32(feature.encode("utf-8")) % N_FEATURES
+        counts[h] = counts.get(h, 0.0) + 1.0
+
+    for i, word in enumerate(words):
+        add("w:" + word)
+        if i:
+            add("b:" + words[i - 1] + " " + word)
+        padded = f" {word} "
+        for n in (2, 3, 4):
+            for j in range(len(padded) - n + 1):
+                add("c:" + padded[j:j + n])
+
+    weights = {h: 1.0 + math.log(c) for h, c in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {h: w / norm for h, w in weights.items()}
+
+
+class CentroidClassifier:
+    """
+    Nearest-centroid intent classifier over hashed n-gram features.
+
+    Cheap enough to run on every query ahead of the transformer: one sparse
+    dot product per intent. `predict` returns the best intent and a
+    softmax confidence over the cosine similarities.
+    """
+
+    def __init__(self):
+        self.centroids: Dict[str, Dict[int, float]] = {}
+
+    def fit(self, texts: List[str], labels: List[str]):
+        sums: Dict[str, Dict[int, float]] = {}
+        for text, label in zip(texts, labels):
+            centroid = sums.setdefault(label, {})
+            for h, w in _features(text).items():
+                centroid[h] = centroid.get(h, 0.0) + w
+        self.centroids = {}
+        for label, centroid in sums.items():
+            norm = math.sqrt(sum(w * w for w in centroid.values())) or 1.0
+            self.centroids[label] = {h: w / norm for h, w in centroid.items()}
+        return self
+
+    def scores(self, text: str) -> Dict[str, float]:
+        features = _features(text)
+        return {
+            label: sum(w * centroid.get(h, 0.0) for h, w in features.items())
+            for label, centroid in self.centroids.items()
+        }
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        scores = self.scores(text)
+        if not scores:
+            return None, 0.0
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        total = sum(math.exp((s - top) / TEMPERATURE) for s in scores.values())
+        return best, 1.0 / total
+
+
+_model: Optional[CentroidClassifier] = None
+_model_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "queries": 0, "answered": 0, "deferred": 0,
+    "shadow_checks": 0, "shadow_agreed": 0,
+    "deferred_checks": 0, "deferred_agreed": 0,
+}
+
+
+def _count(*keys: str):
+    with _stats_lock:
+        for key in keys:
+            _stats[key] += 1
+
+
+def get_classifier() -> CentroidClassifier:
+    """The classifier trained on data/upsert.json, built on first use (a few milliseconds)."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _, labels, texts = load_examples(UPSERT_FILE)
+                _model = CentroidClassifier().fit(texts, labels)
+    return _model
+
+
+def predict(query: str, threshold: float = CASCADE_THRESHOLD) -> Tuple[Optional[str], float, bool]:
+    """
+    Return (intent, confidence, confident). When `confident` is False the
+    caller should defer to the embedding path.
+    """
+    intent, confidence = get_classifier().predict(query)
+    confident = intent is not None and confidence >= threshold
+    _count("queries", "answered" if confident else "deferred")
+    return intent, confidence, confident
+
+
+def should_shadow() -> bool:
+    """Whether to also run the full path for a query the cascade answered, to measure agreement."""
+    return CASCADE_SHADOW_RATE > 0 and random.random() < CASCADE_SHADOW_RATE
+
+
+def record_agreement(cascade_intent: Optional[str], full_intent: Optional[str], answered: bool):
+    prefix = "shadow" if answered else "deferred"
+    if cascade_intent == full_intent:
+        _count(f"{prefix}_checks", f"{prefix}_agreed")
+    else:
+        _count(f"{prefix}_checks")
+
+
+def stats() -> dict:
+    with _stats_lock:
+        out = dict(_stats)
+    out["hit_rate"] = out["answered"] / out["queries"] if out["queries"] else 0.0
+    out["shadow_agreement"] = out["shadow_agreed"] / out["shadow_checks"] if out["shadow_checks"] else None
+    out["deferred_agreement"] = out["deferred_agreed"] / out["deferred_checks"] if out["deferred_checks"] else None
+    return out
+
+
+def evaluate(folds: int = 5, thresholds=(0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99), full_path=None):
+    """
+    K-fold evaluation on upsert.json. For each threshold, prints how many
+    queries the cascade would answer and how often it is right on those.
+    `full_path(texts) -> intents` additionally measures agreement with it.
+    """
+    _, labels, texts = load_examples(UPSERT_FILE)
+    order = list(range(len(texts)))
+    random.Random(0).shuffle(order)
+
+    predictions = [None] * len(texts)
+    for k in range(folds):
+        held_out = set(order[k::folds])
+        train = [i for i in order if i not in held_out]
+        model = CentroidClassifier().fit([texts[i] for i in train], [labels[i] for i in train])
+        for i in held_out:
+            predictions[i] = model.predict(texts[i])
+
+    reference = full_path(texts) if full_path else None
+    print(f"{len(texts)} examples, {folds}-fold")
+    print(f"{'threshold':>9} {'hit rate':>9} {'accuracy':>9} {'agreement':>10}")
+    for threshold in thresholds:
+        hits = [i for i, (_, conf) in enumerate(predictions) if conf >= threshold]
+        correct = sum(predictions[i][0] == labels[i] for i in hits)
+        line = f"{threshold:>9.2f} {len(hits) / len(texts):>9.1%} {correct / len(hits) if hits else 0:>9.1%}"
+        if reference is not None:
+            agreed = sum(predictions[i][0] == reference[i] for i in hits)
+            line += f" {agreed / len(hits) if hits else 0:>10.1%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the first-stage intent classifier")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--compare", action="store_true", help="Also measure agreement with the embedding path")
+    args = parser.parse_args()
+
+    full_path = None
+    if args.compare:
+        from src.embeddings import encode_examples
+        from src.intent_recognition import get_index, _intent_from
+        from src.vector_index import query_many
+
+        def full_path(texts):
+            return [_intent_from(r) for r in query_many(get_index(), encode_examples(texts), top_k=1)]
+
+    evaluate(folds=args.folds, full_path=full_path)
+
+
+if __name__ == "__main__":
+    main()
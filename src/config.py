@@ -2,6 +2,153 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_DIR = os.path.join(ROOT, "data")
+
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "blinkbot")
 EMBEDDING_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+# How the model runs on CPU: "torch" (fp32), "torch-int8" (dynamic int8
+# quantization of the linear layers), "onnx" or "onnx-int8" (ONNX Runtime,
+# needs `pip install "sentence-transformers[onnx]"`). EMBEDDING_DIM > 0 keeps
+# only the first EMBEDDING_DIM dimensions. Compare settings with
+# `python -m src.models --report`.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "0"))
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+# Names the vectors the configured backend produces. Caches, the local index
+# and the upsert manifest are keyed on it, so switching backends re-embeds.
+EMBEDDING_MODEL_KEY = (
+    EMBEDDING_MODEL_NAME if EMBEDDING_BACKEND == "torch" and not EMBEDDING_DIM
+    else f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_BACKEND}:{EMBEDDING_DIM}"
+)
+
+# "pinecone" queries the hosted index, "local" searches the examples from
+# data/upsert.json in-process.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+UPSERT_FILE = os.path.join(DATA_DIR, "upsert.json")
+LOCAL_INDEX_FILE = os.getenv("LOCAL_INDEX_FILE", os.path.join(DATA_DIR, "upsert_embeddings.npz"))
+
+# Query embedding cache: in-memory LRU entries, plus a SQLite file that
+# survives restarts (set EMBEDDING_CACHE_FILE="" to keep it in memory only)
+# and keeps the EMBEDDING_CACHE_DISK_ROWS most recently written vectors.
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_FILE = os.getenv("EMBEDDING_CACHE_FILE", os.path.join(DATA_DIR, "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_DISK_ROWS = int(os.getenv("EMBEDDING_CACHE_DISK_ROWS", "100000"))
+
+# Training upserts: examples per forward pass, vectors per upsert request and
+# how many upsert requests run in parallel.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "4"))
+UPSERT_MANIFEST_FILE = os.path.join(DATA_DIR, "upsert_manifest.json")
+
+# Micro-batching of query embeddings in the server: texts arriving within
+# BATCH_MAX_WAIT_MS of each other share one forward pass of up to
+# BATCH_MAX_SIZE texts.
+EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "1") == "1"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# Embedding worker processes. With EMBED_WORKERS > 0 each server worker
+# encodes in that many separate processes, each with its own model and
+# EMBED_WORKER_THREADS torch threads, and reads the vectors back from shared
+# memory. The pool is per server worker: src/prefork.py --workers W runs
+# W x EMBED_WORKERS embedding processes (and models), using up to
+# W x EMBED_WORKERS x EMBED_WORKER_THREADS cores. 0 encodes in the server
+# process.
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "0"))
+EMBED_WORKER_THREADS = int(os.getenv("EMBED_WORKER_THREADS", "1"))
+
+# Largest list accepted by POST /process/batch.
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "256"))
+
+# Jupiter lite-search fallback for symbols missing from data/tokens.json.
+# JUPITER_QUERY_BUDGET caps the total time one query waits on lookups;
+# confirmed misses are not asked again for JUPITER_NEGATIVE_TTL seconds.
+# At most JUPITER_CACHE_SIZE misses (and hits that came in after their
+# query's budget) are remembered; the oldest go first.
+LITE_SEARCH_URL = os.getenv("LITE_SEARCH_URL", "https://lite-api.jup.ag/tokens/v2/search?query=")
+JUPITER_TIMEOUT = float(os.getenv("JUPITER_TIMEOUT", "8"))
+JUPITER_QUERY_BUDGET = float(os.getenv("JUPITER_QUERY_BUDGET", "1.5"))
+JUPITER_NEGATIVE_TTL = float(os.getenv("JUPITER_NEGATIVE_TTL", "3600"))
+JUPITER_MAX_WORKERS = int(os.getenv("JUPITER_MAX_WORKERS", "8"))
+JUPITER_CACHE_SIZE = int(os.getenv("JUPITER_CACHE_SIZE", "10000"))
+
+# Newly discovered tokens are appended to data/tokens.journal and folded
+# into data/tokens.json this many seconds later.
+TOKEN_COMPACT_DELAY = float(os.getenv("TOKEN_COMPACT_DELAY", "30"))
+
+# Binary token index (symbols, mints, decimals, CoinGecko ids, logos)
+# written by `python src/token_loader.py --refresh`.
+TOKEN_INDEX_FILE = os.getenv("TOKEN_INDEX_FILE", os.path.join(DATA_DIR, "tokens.idx"))
+
+# How often (seconds) running processes check the token files for a newer
+# refresh and swap it in; 0 disables hot reload.
+TOKEN_RELOAD_INTERVAL = float(os.getenv("TOKEN_RELOAD_INTERVAL", "60"))
+
+# First-stage classifier ahead of the embedding path: answers when its
+# confidence reaches CASCADE_THRESHOLD, otherwise defers. CASCADE_SHADOW_RATE
+# is the fraction of answered queries also run through the full path to
+# measure agreement. Tune with `python -m src.cascade`.
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "0") == "1"
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.9"))
+CASCADE_SHADOW_RATE = float(os.getenv("CASCADE_SHADOW_RATE", "0.01"))
+
+# Template -> intent cache shared by all workers through a SQLite file.
+# INTENT_CACHE_PREWARM_FILE (JSONL with a "query" field, or one query per
+# line) is classified into the cache at server startup.
+INTENT_CACHE_ENABLED = os.getenv("INTENT_CACHE_ENABLED", "1") == "1"
+INTENT_CACHE_FILE = os.getenv("INTENT_CACHE_FILE", os.path.join(DATA_DIR, "intent_cache.sqlite3"))
+INTENT_CACHE_TTL = float(os.getenv("INTENT_CACHE_TTL", "86400"))
+INTENT_CACHE_MAX_ENTRIES = int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "100000"))
+INTENT_CACHE_PREWARM_FILE = os.getenv("INTENT_CACHE_PREWARM_FILE", "")
+
+# Per-stage timings and decision counters, served at GET /metrics (Prometheus
+# text format) and as a Server-Timing header on /process responses.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# On-demand profiling of single /process requests, off unless
+# PROFILING_ENABLED=1. Then a request is profiled when it sends an
+# "X-Profile: 1" header, or at random with probability PROFILE_SAMPLE_RATE.
+# PROFILE_MODE "cprofile" writes .pstats files, "sample" writes speedscope
+# JSON from a stack sampler running every PROFILE_INTERVAL_MS. Only the
+# newest PROFILE_MAX_FILES profiles in PROFILE_DIR are kept.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile").lower()
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(ROOT, "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+# Misspelled token symbols ("usdcc", "bokn") are corrected locally, within
+# edit distance 1-2, towards the built-in tokens, their synonyms and index
+# symbols that have a CoinGecko id, before any Jupiter lookup. Words the
+# token index knows exactly are never corrected. Corrections below
+# TYPO_MIN_CONFIDENCE are ignored.
+TYPO_CORRECTION = os.getenv("TYPO_CORRECTION", "1") == "1"
+TYPO_MIN_CONFIDENCE = float(os.getenv("TYPO_MIN_CONFIDENCE", "0.75"))
+
+# Admission control. At most MAX_CONCURRENT_REQUESTS /process calls run at
+# once; more get an immediate 429. At most EMBED_CONCURRENCY queries are in
+# the embedding stage, and up to EMBED_QUEUE_SIZE more wait up to
+# EMBED_QUEUE_TIMEOUT_MS for a slot. Queries that get none are answered by
+# the first-stage classifier's best guess, flagged "degraded", or get a 503.
+# 0 disables a limit.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", str(BATCH_MAX_SIZE)))
+EMBED_QUEUE_SIZE = int(os.getenv("EMBED_QUEUE_SIZE", "64"))
+EMBED_QUEUE_TIMEOUT_MS = float(os.getenv("EMBED_QUEUE_TIMEOUT_MS", "250"))
+RETRY_AFTER_SECONDS = float(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+# Pinecone query protection. Each query gets INDEX_DEADLINE_MS in total; a
+# second, hedged request goes out once the first has taken longer than the
+# INDEX_HEDGE_QUANTILE of recent latencies (at least INDEX_HEDGE_MIN_MS).
+# After INDEX_BREAKER_FAILURES failures in a row the breaker stops calling
+# Pinecone for INDEX_BREAKER_RESET_SECONDS and queries are answered locally.
+INDEX_DEADLINE_MS = float(os.getenv("INDEX_DEADLINE_MS", "1500"))
+INDEX_HEDGE_QUANTILE = float(os.getenv("INDEX_HEDGE_QUANTILE", "0.95"))
+INDEX_HEDGE_MIN_MS = float(os.getenv("INDEX_HEDGE_MIN_MS", "50"))
+INDEX_BREAKER_FAILURES = int(os.getenv("INDEX_BREAKER_FAILURES", "5"))
+INDEX_BREAKER_RESET_SECONDS = float(os.getenv("INDEX_BREAKER_RESET_SECONDS", "30"))
@@ -0,0 +1,188 @@
+import os
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed by (model name, normalized text).
+
+    A size-bounded in-memory LRU sits in front of an optional SQLite file,
+    so repeated phrasings skip the forward pass, also across restarts. The
+    file keeps the `max_disk_rows` most recently written vectors.
+
+    New vectors are written to the file in one transaction by a background
+    timer FLUSH_AFTER seconds after the first of them, never on the request
+    path.
+    """
+
+    PRUNE_EVERY = 1000
+    FLUSH_AFTER = 1.0
+
+    def __init__(self, max_size: int = 10000, path: Optional[str] = None, max_disk_rows: int = 100000):
+        self.max_size = max_size
+        self.path = path
+        self.max_disk_rows = max_disk_rows
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._db = None
+        self._write_db = None
+        self._pid = None
+        # key -> vector bytes, not written to the file yet
+        self._pending = {}
+        self._timer = None
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            atexit.register(self.flush)
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            print(f"Embedding cache disabled on disk: {e}")
+            self.path = None
+            return None
+
+    def _check_fork(self):
+        # Connections and the timer thread must not cross a fork, so each
+        # process opens its own. Call with `_lock` held.
+        if self._pid != os.getpid():
+            self._db = self._write_db = self._timer = None
+            self._pid = os.getpid()
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        self._check_fork()
+        if self._db is None:
+            self._db = self._open()
+        return self._db
+
+    @staticmethod
+    def key(text: str, model_name: str) -> str:
+        return f"{model_name}\x00{normalize_query(text)}"
+
+    def get(self, text: str, model_name: str, count: bool = True) -> Optional[np.ndarray]:
+        """Cached vector for `text`, or None. `count=False` leaves the hit/miss counters alone."""
+        key = self.key(text, model_name)
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is None and key in self._pending:
+                vector = np.frombuffer(self._pending[key], dtype=np.float32)
+            if vector is not None:
+                self._remember(key, vector)
+                self.hits += count
+                return vector
+
+            db = self._conn()
+            if db is not None:
+                row = db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.hits += count
+                    self.disk_hits += count
+                    return vector
+
+            self.misses += count
+            return None
+
+    def put(self, text: str, model_name: str, vector) -> np.ndarray:
+        key = self.key(text, model_name)
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if self.path:
+                self._check_fork()
+                self._pending[key] = vector.tobytes()
+                if self._timer is None:
+                    self._timer = threading.Timer(self.FLUSH_AFTER, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        return vector
+
+    def flush(self):
+        """Write the pending vectors to the file in one transaction."""
+        with self._flush_lock:
+            with self._lock:
+                self._check_fork()
+                self._timer = None
+                rows = list(self._pending.items())
+                if self._write_db is None and rows and self.path:
+                    self._write_db = self._open()
+                db = self._write_db
+            if not rows or db is None:
+                return
+            try:
+                db.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+                db.commit()
+                self._writes += len(rows)
+                if self._writes >= self.PRUNE_EVERY:
+                    self._writes = 0
+                    self._prune(db)
+            except sqlite3.Error as e:
+                print(f"Failed to persist embeddings: {e}")
+            finally:
+                with self._lock:
+                    for key, data in rows:
+                        if self._pending.get(key) is data:
+                            del self._pending[key]
+
+    def _prune(self, db: sqlite3.Connection):
+        # INSERT OR REPLACE gives a rewritten key a new rowid, so rowid order is write order.
+        db.execute(
+            "DELETE FROM embeddings WHERE rowid IN ("
+            " SELECT rowid FROM embeddings ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_rows,),
+        )
+        db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._lru),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "pending_writes": len(self._pending),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._pending.clear()
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM embeddings")
+                db.commit()
@@ -0,0 +1,218 @@
+import os
+import queue
+import threading
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from src.admission import Overloaded
+from src.config import RETRY_AFTER_SECONDS
+
+
+class EmbeddingWorkerError(Overloaded):
+    """An embedding worker failed, died (and is being replaced) or none was free; handled like Overloaded."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason, RETRY_AFTER_SECONDS)
+
+
+def _default_model():
+    from src.models import get_model
+    return get_model()
+
+
+def _worker_main(conn, threads: int, factory: Callable, capacity: int):
+    # Before torch is imported (by the factory), so its pools start small.
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    model = factory()
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    dim = int(np.asarray(model.encode("warmup")).shape[-1])
+    conn.send(("ready", dim))
+    shm = SharedMemory(name=conn.recv())
+    out = np.ndarray((capacity, dim), dtype=np.float32, buffer=shm.buf)
+    try:
+        while True:
+            texts = conn.recv()
+            if texts is None:
+                break
+            try:
+                out[:len(texts)] = model.encode(texts, batch_size=len(texts))
+                conn.send(("ok", len(texts)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        del out
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, ctx, index: int, threads: int, factory: Callable, capacity: int):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child, threads, factory, capacity),
+            name=f"embedding-worker-{index}", daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.capacity = capacity
+        self.shm = None
+        self.out = None
+
+    def handshake(self, timeout: float):
+        if not self.conn.poll(timeout):
+            raise EmbeddingWorkerError(f"{self.process.name} did not load its model within {timeout:.0f}s")
+        _, dim = self.conn.recv()
+        self.shm = SharedMemory(create=True, size=self.capacity * dim * 4)
+        self.out = np.ndarray((self.capacity, dim), dtype=np.float32, buffer=self.shm.buf)
+        self.conn.send(self.shm.name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.conn.send(texts)
+        status, payload = self.conn.recv()
+        if status != "ok":
+            raise EmbeddingWorkerError(payload)
+        return self.out[:payload].copy()
+
+    def close(self, timeout: float = 5.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        if self.shm is not None:
+            self.out = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class EmbeddingPool:
+    """
+    A fixed set of embedding processes, each with its own model and a
+    pinned number of torch threads, so encoding neither competes with
+    request handling for the GIL nor oversubscribes cores.
+
+    `encode` borrows an idle worker (waiting if all are busy), sends it the
+    texts over a pipe and reads the vectors back from that worker's
+    shared-memory buffer; only the texts are pickled. Workers are started
+    with "spawn", which is safe from a process that has already loaded
+    torch. A worker that dies, or whose reply was left unread, is replaced
+    in the background.
+
+    The pool belongs to the process that started it: under src/prefork.py
+    every HTTP worker starts its own, so there are WORKERS x EMBED_WORKERS
+    embedding processes in total.
+    """
+
+    def __init__(self, workers: int, threads: int = 1, capacity: int = 64,
+                 factory: Callable = _default_model, start_timeout: float = 600.0):
+        self.size = max(1, workers)
+        self.threads = max(1, threads)
+        self.capacity = max(1, capacity)
+        self.factory = factory
+        self.start_timeout = start_timeout
+        self._ctx = mp.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._spawned = 0
+        self.batches = 0
+        self.restarts = 0
+
+    def _spawn(self) -> _Worker:
+        with self._lock:
+            index = self._spawned
+            self._spawned += 1
+        worker = _Worker(self._ctx, index, self.threads, self.factory, self.capacity)
+        try:
+            worker.handshake(self.start_timeout)
+        except Exception:
+            worker.close()
+            raise
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def start(self):
+        # Launch all processes first so their models load in parallel.
+        pending = [_Worker(self._ctx, i, self.threads, self.factory, self.capacity) for i in range(self.size)]
+        self._spawned = self.size
+        try:
+            for worker in pending:
+                worker.handshake(self.start_timeout)
+        except Exception:
+            for worker in pending:
+                worker.close()
+            raise
+        self._workers = pending
+        for worker in pending:
+            self._idle.put(worker)
+        print(f"Started {self.size} embedding workers with {self.threads} thread(s) each")
+        return self
+
+    def _replace(self, dead: _Worker):
+        with self._lock:
+            if dead in self._workers:
+                self._workers.remove(dead)
+        dead.close(timeout=0)
+        if self._closed:
+            return
+        try:
+            worker = self._spawn()
+        except Exception as e:
+            print(f"Failed to restart embedding worker: {e}")
+            return
+        self.restarts += 1
+        self._idle.put(worker)
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Embed `texts` on one worker, `capacity` texts per round trip; rows follow `texts`."""
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise EmbeddingWorkerError("no embedding worker became free in time") from None
+        try:
+            rows = [worker.encode(texts[i:i + self.capacity]) for i in range(0, len(texts), self.capacity)]
+        except EmbeddingWorkerError:
+            # The worker answered with an error, so its pipe is in step.
+            self._idle.put(worker)
+            raise
+        except BaseException as e:
+            # Dead, or interrupted between send and recv with a reply still
+            # in the pipe that the next caller would read as its own.
+            threading.Thread(target=self._replace, args=(worker,), daemon=True).start()
+            if isinstance(e, (EOFError, OSError)):
+                raise EmbeddingWorkerError(f"{worker.process.name} exited") from e
+            raise
+        self._idle.put(worker)
+        self.batches += 1
+        return np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "idle": self._idle.qsize(),
+            "threads_per_worker": self.threads,
+            "batches": self.batches,
+            "restarts": self.restarts,
+        }
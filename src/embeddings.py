@@ -1,6 +1,121 @@
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from typing import List
+
+from src.config import (
+    EMBEDDING_MODEL_KEY, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_DISK_ROWS, EMBED_BATCH_SIZE,
+    BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, EMBED_WORKERS, EMBED_WORKER_THREADS,
+)
+from src.batching import EmbeddingBatcher
+from src.embedding_pool import EmbeddingPool
+from src.embedding_cache import EmbeddingCache, normalize_query
+from src.models import get_model
+from src import metrics
+
+
+cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_FILE or None, EMBEDDING_CACHE_DISK_ROWS)
+_batcher = None
+_pool = None
+
+
+def _encode_batch(texts: List[str], batch_size: int = None) -> np.ndarray:
+    pool = _pool
+    if pool is not None:
+        return pool.encode(texts)
+    return get_model().encode(texts, batch_size=batch_size or len(texts))
+
+
+def enable_pool(workers: int = EMBED_WORKERS, threads: int = EMBED_WORKER_THREADS, **kwargs):
+    """Encode in `workers` separate processes from now on (see src/embedding_pool.py)."""
+    global _pool
+    if _pool is None:
+        _pool = EmbeddingPool(workers, threads, capacity=max(BATCH_MAX_SIZE, EMBED_BATCH_SIZE), **kwargs).start()
+    return _pool
+
+
+def disable_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+def pool_stats() -> dict:
+    return _pool.stats() if _pool is not None else {}
+
+
+def enable_batching(max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS, active=None):
+    """Route cache misses from encode_query through a shared micro-batcher."""
+    global _batcher
+    if _batcher is None:
+        # One batch in flight per embedding process, or one for the in-process model.
+        concurrency = _pool.size if _pool is not None else 1
+        _batcher = EmbeddingBatcher(_encode_batch, max_batch_size, max_wait_ms, active, concurrency).start()
+    return _batcher
+
+
+def disable_batching():
+    global _batcher
+    if _batcher is not None:
+        _batcher.stop()
+        _batcher = None
+
+
+def batching_stats() -> dict:
+    return _batcher.stats() if _batcher is not None else {}
+
+
+def encode_query(text: str) -> np.ndarray:
+    """
+    Embed a query, answering repeated phrasings from the embedding cache.
+    The model sees the normalized (lower-cased, whitespace-collapsed) text.
+    """
+    vector = cache.get(text, EMBEDDING_MODEL_KEY)
+    metrics.count("blinkbot_cache_requests_total", cache="embedding", result="miss" if vector is None else "hit")
+    if vector is None:
+        normalized = normalize_query(text)
+        batcher = _batcher
+        if batcher is not None:
+            encoded = batcher.encode(normalized)
+        else:
+            encoded = _encode_batch([normalized])[0]
+        vector = cache.put(text, EMBEDDING_MODEL_KEY, encoded)
+    return vector
+
+
+def generate_embeddings(texts: List[str], batch_size: int = EMBED_BATCH_SIZE, queries: bool = False) -> np.ndarray:
+    """
+    Embed many texts at once. Cached texts are looked up, the rest go through
+    the model in batches of `batch_size`. Rows follow the order of `texts`.
+    Only `queries=True` calls (user traffic, not training examples) count
+    towards the cache hit and miss numbers.
+    """
+    vectors = [cache.get(t, EMBEDDING_MODEL_KEY, count=queries) for t in texts]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if queries:
+        metrics.count("blinkbot_cache_requests_total", len(texts) - len(missing), cache="embedding", result="hit")
+        metrics.count("blinkbot_cache_requests_total", len(missing), cache="embedding", result="miss")
+    if missing:
+        encoded = _encode_batch([normalize_query(texts[i]) for i in missing], batch_size)
+        for i, vector in zip(missing, encoded):
+            vectors[i] = cache.put(texts[i], EMBEDDING_MODEL_KEY, vector)
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(vectors)
+
+
+def encode_examples(texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Embed training examples in batches of `batch_size`, normalized like
+    queries but never read from or written to the query embedding cache.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([
+        _encode_batch([normalize_query(t) for t in texts[i:i + batch_size]], batch_size)
+        for i in range(0, len(texts), batch_size)
+    ])
 
-_model = SentenceTransformer("all-mpnet-base-v2")
 
 def generate_embedding(text: str) -> list:
     """
@@ -10,4 +125,8 @@ def generate_embedding(text: str) -> list:
     Returns:
         list: Embedding as a list of floats.
     """
-    return _model.encode(text.lower()).tolist()
+    return encode_query(text).tolist()
+
+
+def cache_stats() -> dict:
+    return cache.stats()
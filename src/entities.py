@@ -1,14 +1,22 @@
 import os
 import re
 import json
-import requests
-from typing import Optional, Dict, Set
+import time
+import threading
+from functools import cached_property
+from typing import Optional, Dict, List, Set
+
+from src.config import TOKEN_INDEX_FILE, TOKEN_RELOAD_INTERVAL, TYPO_CORRECTION, TYPO_MIN_CONFIDENCE
+from src.jupiter import lookup_many
+from src import metrics
+from src.spelling import Correction, SpellIndex
+from src.token_index import TokenIndex, TokenInfo, open_index
+from src.token_matcher import TokenMatcher
+from src.token_store import append_discovery, read_discoveries, read_generation
 
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 TOKEN_FILE = os.path.join(ROOT, "data", "tokens.json")
-LITE_SEARCH_URL = "https://lite-api.jup.ag/tokens/v2/search?query="
-HTTP_TIMEOUT = 8
 
 
 PRELOAD_TOKENS = True
@@ -36,132 +44,416 @@ BONK_LOCK_URL = (
 
 
 _cached_tokens: Optional[Set[str]] = None
+_token_index: Optional[TokenIndex] = None
+_tokens_generation = None
+_matcher: Optional[TokenMatcher] = None
+_matcher_source = None
+_speller: Optional[SpellIndex] = None
+_speller_source = None
 
+_token_lock = threading.Lock()
+# Held by whoever is checking for (or running) a reload; other requests skip the check.
+_reload_lock = threading.Lock()
+_next_reload_check = 0.0
 
-def load_cached_tokens() -> Set[str]:
-    global _cached_tokens
-    if _cached_tokens is not None:
-        return _cached_tokens
 
+def _read_token_file() -> Optional[Set[str]]:
     try:
         if os.path.exists(TOKEN_FILE):
             with open(TOKEN_FILE, "r") as f:
                 data = json.load(f)
                 if isinstance(data, list):
-                    _cached_tokens = {s.upper() for s in data}
+                    return {s.upper() for s in data}
                 elif isinstance(data, dict):
                     found = []
                     for v in data.values():
                         if isinstance(v, list):
                             found = v
                             break
-                    _cached_tokens = {s.upper() for s in found} if found else set(BUILTIN_TOKENS)
-                else:
-                    _cached_tokens = set(BUILTIN_TOKENS)
-                print(f"Loaded {len(_cached_tokens)} tokens from cache")
-                return _cached_tokens
+                    return {s.upper() for s in found} if found else set(BUILTIN_TOKENS)
+                return set(BUILTIN_TOKENS)
     except Exception as e:
         print(f"Failed to load token cache: {e}")
+    return None
+
+
+def _load_token_state():
+    """
+    Read the token index and the in-memory symbol set from disk without
+    touching module state. When the binary index is present tokens.json is
+    not read at all: the set only holds what the index does not, built-ins
+    and the discoveries (the small discovered-symbols file and the journal).
+    """
+    generation = read_generation()
+    index = open_index(TOKEN_INDEX_FILE)
+    if index is not None:
+        tokens = set(BUILTIN_TOKENS)
+    else:
+        tokens = _read_token_file() or set(BUILTIN_TOKENS)
+    tokens.update(read_discoveries())
+    return index, tokens, generation
+
+
+def _build_matcher(index: Optional[TokenIndex], tokens: Set[str]) -> TokenMatcher:
+    # Single-word index symbols are found word by word in the mmap index, so
+    # only the ones a word split cannot see ("$WIF", "USD COIN") are copied in.
+    symbols = tokens | BUILTIN_TOKENS
+    if index is not None:
+        symbols.update(s for s in index.symbols() if not WORD_PATTERN.fullmatch(s))
+    return TokenMatcher(symbols, TOKEN_SYNONYMS)
+
+
+def reload_tokens():
+    """
+    Load the token files again and swap the new state in. Everything is built
+    on the side first, so requests keep using the old set until the swap and
+    requests already holding the old index or trie can finish with them.
+    """
+    global _token_index, _cached_tokens, _tokens_generation, _matcher, _matcher_source
+    index, tokens, generation = _load_token_state()
+    matcher = _build_matcher(index, tokens)
+    with _token_lock:
+        _token_index, _cached_tokens, _tokens_generation = index, tokens, generation
+        _matcher, _matcher_source = matcher, (id(tokens), id(index))
+    print(f"Reloaded tokens ({len(index) if index is not None else len(tokens)} symbols)")
+
+
+def _pick_up_discoveries():
+    """Add symbols other processes discovered, without rebuilding anything."""
+    for symbol in read_discoveries():
+        if not is_known_token(symbol):
+            _add_token(symbol)
+
+
+def _reload_in_background(generation_changed: bool):
+    try:
+        if generation_changed:
+            reload_tokens()
+        else:
+            _pick_up_discoveries()
+    except Exception as e:
+        print(f"Token reload failed: {e}")
+    finally:
+        _reload_lock.release()
+
+
+def _maybe_reload():
+    """
+    Every TOKEN_RELOAD_INTERVAL seconds, check the token files in the
+    background. A refresh (new generation) swaps in a new index and trie;
+    otherwise only new discoveries are added to the current ones.
+    Compaction rewriting tokens.json does not count as a change.
+    """
+    global _next_reload_check
+    if TOKEN_RELOAD_INTERVAL <= 0 or time.monotonic() < _next_reload_check:
+        return
+    if not _reload_lock.acquire(blocking=False):
+        return
+    now = time.monotonic()
+    if now < _next_reload_check:
+        _reload_lock.release()
+        return
+    _next_reload_check = now + TOKEN_RELOAD_INTERVAL
+    changed = read_generation() != _tokens_generation
+    threading.Thread(target=_reload_in_background, args=(changed,), name="token-reload", daemon=True).start()
+
 
-    _cached_tokens = set(BUILTIN_TOKENS)
+def load_cached_tokens() -> Set[str]:
+    global _token_index, _cached_tokens, _tokens_generation, _next_reload_check
+    if _cached_tokens is not None:
+        _maybe_reload()
+        return _cached_tokens
+
+    with _token_lock:
+        if _cached_tokens is None:
+            _token_index, _cached_tokens, _tokens_generation = _load_token_state()
+            _next_reload_check = time.monotonic() + TOKEN_RELOAD_INTERVAL
+            if _token_index is not None:
+                print(f"Loaded {len(_token_index)} tokens from index")
+            else:
+                print(f"Loaded {len(_cached_tokens)} tokens from cache")
     return _cached_tokens
 
 
+def get_token_index() -> Optional[TokenIndex]:
+    """The memory-mapped token index written by token_loader, if there is one."""
+    load_cached_tokens()
+    return _token_index
+
+
+def get_token_matcher() -> TokenMatcher:
+    """
+    Trie over the built-ins, synonyms, in-memory symbols and the index
+    symbols that are not a single word; rebuilt when the token set is replaced.
+    """
+    global _matcher, _matcher_source
+    tokens = load_cached_tokens()
+    index = _token_index
+    if _matcher is None or _matcher_source != (id(tokens), id(index)):
+        _matcher = _build_matcher(index, tokens)
+        _matcher_source = (id(tokens), id(index))
+    return _matcher
+
+
+def get_token_speller() -> SpellIndex:
+    """Typo index over the built-ins, synonyms and index symbols with a CoinGecko id."""
+    global _speller, _speller_source
+    load_cached_tokens()
+    index = _token_index
+    if _speller is None or _speller_source != id(index):
+        symbols = set(BUILTIN_TOKENS)
+        if index is not None:
+            symbols.update(index.symbols(coingecko_only=True))
+        _speller = SpellIndex(symbols, TOKEN_SYNONYMS)
+        _speller_source = id(index)
+    return _speller
+
+
+def correct_token(symbol: str) -> Optional[Correction]:
+    """The closest well-known symbol to a misspelled one, if it is close enough to trust."""
+    if not TYPO_CORRECTION:
+        return None
+    correction = get_token_speller().lookup(symbol)
+    if correction is None or correction.confidence < TYPO_MIN_CONFIDENCE:
+        return None
+    return correction
+
+
+def is_known_token(symbol: str) -> bool:
+    """Local membership check: in-memory set first, then the binary index."""
+    if symbol in load_cached_tokens():
+        return True
+    index = get_token_index()
+    return index is not None and symbol in index
+
+
+def token_info(symbol: str) -> Optional[TokenInfo]:
+    """Mint, decimals, CoinGecko id and logo for `symbol`, when the index has them."""
+    index = get_token_index()
+    return index.get(symbol) if index is not None else None
+
+
+def _add_token(symbol: str):
+    load_cached_tokens().add(symbol)
+    if _matcher is not None:
+        _matcher.add(symbol)
+
+
 def save_token_to_cache(symbol: str):
     s = symbol.upper().strip()
     if not s:
         return
-    tokens = load_cached_tokens()
-    if s in tokens:
+    if is_known_token(s):
         return
-    tokens.add(s)
-    os.makedirs(os.path.dirname(TOKEN_FILE), exist_ok=True)
-    with open(TOKEN_FILE, "w") as f:
-        json.dump(sorted(tokens), f, indent=2)
-
-
-def search_jupiter_lite(symbol: str) -> bool:
+    _add_token(s)
     try:
-        resp = requests.get(LITE_SEARCH_URL + symbol, timeout=HTTP_TIMEOUT)
-        if resp.status_code != 200:
-            return False
-        data = resp.json()
-        for token in data:
-            if token.get("symbol", "").upper() == symbol.upper():
-                return True
-    except Exception:
-        pass
-    return False
+        append_discovery(s)
+    except OSError as e:
+        print(f"Failed to record token {s}: {e}")
 
 
-def is_valid_token(symbol: str, allow_fallback_api: bool = True) -> bool:
+def resolve_token(symbol: str, allow_fallback_api: bool = True, allow_correction: bool = True) -> Optional[Correction]:
+    """
+    The symbol `symbol` stands for: itself or its synonym when known, else
+    a local typo correction, else itself if Jupiter knows it. Everything
+    but the Jupiter call is local. A ticker the token index knows exactly
+    is kept as it is, however close it is to a well-known one. Exact
+    matches come back with distance 0 and confidence 1.
+    """
     if not symbol:
-        return False
+        return None
     s = symbol.upper().strip()
     if s in TOKEN_SYNONYMS:
         s = TOKEN_SYNONYMS[s]
-    tokens = load_cached_tokens()
-    if s in tokens:
-        return True
-    if allow_fallback_api:
-        found = search_jupiter_lite(s)
-        if found:
-            save_token_to_cache(s)
-            load_cached_tokens().add(s)
-            return True
-    return False
+    if is_known_token(s):
+        return Correction(s, 0, 1.0)
+    if allow_correction:
+        correction = correct_token(s)
+        if correction is not None:
+            metrics.count("blinkbot_token_corrections_total")
+            return correction
+    if allow_fallback_api and s in lookup_many([s]):
+        save_token_to_cache(s)
+        return Correction(s, 0, 1.0)
+    return None
+
+
+def is_valid_token(symbol: str, allow_fallback_api: bool = True) -> bool:
+    return resolve_token(symbol, allow_fallback_api) is not None
 
 def normalize_text(text: str) -> str:
     return text.upper().strip()
 
 
-def words_from_text(text: str):
-    return re.findall(r"[A-Z0-9]+", normalize_text(text))
+WORD_PATTERN = re.compile(r"[A-Z0-9]+")
+ADDRESS_PATTERN = re.compile(r"\b[1-9A-HJ-NP-Za-km-z]{32,44}\b")
+DOMAIN_PATTERN = re.compile(r"\b[\w\d-]+\.(sol|eth|degen|monad|letsbonk)\b", re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(r"(\d+(\.\d+)?)")
+SWAP_PATTERN = re.compile(
+    r"swap\s*(\d+(\.\d+)?)?\s*([A-Za-z0-9]+)\s*(to|for)\s*([A-Za-z0-9]+)", re.IGNORECASE
+)
+BALANCE_PATTERN = re.compile(r"(balance\s*(of)?\s*([A-Z0-9]+))|([A-Z0-9]+)\s*balance")
+TRANSFER_PATTERN = re.compile(r"(\d+(\.\d+)?)?\s*([A-Z0-9]+)?\s*to\s*[1-9A-HJ-NP-Za-km-z]{32,44}")
 
 
-def extract_tokens(text: str):
-    words = words_from_text(text)
-    tokens_found = []
-    for w in words:
-        if w in FILLER_WORDS:
-            continue
-        candidate = TOKEN_SYNONYMS.get(w, w)
-        if is_valid_token(candidate, allow_fallback_api=False):
-            tokens_found.append(candidate)
+class ParsedQuery:
+    """
+    One query, scanned at most once per kind of entity.
+
+    Every attribute is computed on first access and kept, so the intent
+    parsers (and parse_intent dispatching between them) can ask for tokens,
+    the amount, the wallet or the domain as often as they like.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._resolved = {}
+        # input word -> Correction, for symbols that were typo-corrected
+        self.corrections: Dict[str, Correction] = {}
+
+    @cached_property
+    def collapsed(self) -> str:
+        return " ".join(self.text.split())
+
+    @cached_property
+    def upper(self) -> str:
+        return self.collapsed.upper()
+
+    @cached_property
+    def words(self):
+        """(start, end, word) spans of the alphanumeric runs in `upper`."""
+        return [(m.start(), m.end(), m.group(0)) for m in WORD_PATTERN.finditer(self.upper)]
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        return _extract_tokens(self)
+
+    @cached_property
+    def amount(self) -> Optional[float]:
+        match = AMOUNT_PATTERN.search(self.text)
+        return float(match.group(1)) if match else None
+
+    @cached_property
+    def wallet(self) -> Optional[str]:
+        match = ADDRESS_PATTERN.search(self.text)
+        return match.group(0) if match else None
+
+    @cached_property
+    def domain(self) -> Optional[str]:
+        match = DOMAIN_PATTERN.search(self.text)
+        return match.group(0) if match else None
+
+    def resolve(self, symbol: str, allow_fallback_api: bool = True, allow_correction: bool = True) -> Optional[str]:
+        """resolve_token, remembered for the lifetime of the query; returns the symbol to use."""
+        key = symbol.upper().strip()
+        if key not in self._resolved:
+            match = resolve_token(key, allow_fallback_api, allow_correction)
+            if match is None and not (allow_fallback_api and allow_correction):
+                # Not final: a later, fuller resolution may still find it.
+                return None
+            self.record(key, match)
+        match = self._resolved[key]
+        return match.symbol if match else None
+
+    def record(self, word: str, match: Optional[Correction]):
+        """Remember how `word` resolved (None: not a token) for the rest of the query."""
+        key = word.upper().strip()
+        self._resolved[key] = match
+        if match is not None and match.distance:
+            self.corrections[key] = match
+
+    def is_token(self, symbol: str) -> bool:
+        return self.resolve(symbol) is not None
+
+
+def as_parsed_query(text) -> ParsedQuery:
+    return text if isinstance(text, ParsedQuery) else ParsedQuery(text)
+
+
+def words_from_text(text: str):
+    return WORD_PATTERN.findall(normalize_text(text))
+
+
+def _extract_tokens(q: ParsedQuery) -> List[str]:
+    found = []
+    covered = []
+    for span in get_token_matcher().find(q.upper):
+        covered.append((span.start, span.end))
+        if span.text not in FILLER_WORDS:
+            found.append((span.start, span.symbol))
+
+    index = get_token_index()
+    if index is not None:
+        # Mint addresses are case-sensitive, so they are looked up in the
+        # collapsed original, whose positions line up with `upper`.
+        for m in ADDRESS_PATTERN.finditer(q.collapsed):
+            symbol = index.symbol_for_mint(m.group(0))
+            if symbol:
+                covered.append((m.start(), m.end()))
+                found.append((m.start(), symbol))
+        covered.sort()
+
+    # Words the trie did not recognise are looked up in the index, and the
+    # rest fall back to the lite-search API, all at once and within the
+    # per-query budget.
+    unknown = []
+    spans = iter(covered)
+    current = next(spans, None)
+    for start, end, w in q.words:
+        while current and current[1] <= start:
+            current = next(spans, None)
+        if current and current[0] < end:
             continue
-        if is_valid_token(candidate, allow_fallback_api=True):
-            tokens_found.append(candidate)
+        if w in FILLER_WORDS:
             continue
-    return list(dict.fromkeys(tokens_found))
+        symbol = q.resolve(w, allow_fallback_api=False)
+        if symbol:
+            found.append((start, symbol))
+        elif len(w) < 32:
+            # Address-length words are wallets, never symbols.
+            unknown.append((start, w))
+
+    if unknown:
+        resolved = lookup_many(w for _, w in unknown)
+        for start, w in unknown:
+            match = None
+            if w in resolved:
+                save_token_to_cache(w)
+                match = Correction(w, 0, 1.0)
+            q.record(w, match)
+            if match is not None:
+                found.append((start, match.symbol))
+
+    found.sort(key=lambda item: item[0])
+    return list(dict.fromkeys(symbol for _, symbol in found))
+
+
+def extract_tokens(text: str):
+    return list(as_parsed_query(text).tokens)
 
 
 def extract_wallet_address(text: str):
-    match = re.search(r"\b[1-9A-HJ-NP-Za-km-z]{32,44}\b", text)
-    return match.group(0) if match else None
+    return as_parsed_query(text).wallet
 
 
 def extract_domain(text: str):
-    match = re.search(r"\b[\w\d-]+\.(sol|eth|degen|monad|letsbonk)\b", text, re.IGNORECASE)
-    return match.group(0) if match else None
+    return as_parsed_query(text).domain
 
 
 def extract_amount(text: str):
-    match = re.search(r"(\d+(\.\d+)?)", text)
-    return float(match.group(1)) if match else None
+    return as_parsed_query(text).amount
 
-def parse_swap_intent(text: str):
-    amount = extract_amount(text)
-    tokens = extract_tokens(text)
+def parse_swap_intent(text):
+    q = as_parsed_query(text)
+    amount = q.amount
+    tokens = q.tokens
 
-    match = re.search(
-        r"swap\s*(\d+(\.\d+)?)?\s*([A-Za-z0-9]+)\s*(to|for)\s*([A-Za-z0-9]+)",
-        text, re.IGNORECASE
-    )
+    match = SWAP_PATTERN.search(q.text)
     if match:
         amount = float(match.group(1)) if match.group(1) else amount
-        from_tok = TOKEN_SYNONYMS.get(match.group(3).upper(), match.group(3).upper())
-        to_tok = TOKEN_SYNONYMS.get(match.group(5).upper(), match.group(5).upper())
-        if is_valid_token(from_tok) and is_valid_token(to_tok):
+        from_tok = q.resolve(match.group(3))
+        to_tok = q.resolve(match.group(5)) if from_tok else None
+        if from_tok and to_tok:
             url = f"https://jup.ag/swap/{from_tok}-{to_tok}"
             if amount:
                 url += f"?amount={amount}"
@@ -176,11 +468,12 @@ def parse_swap_intent(text: str):
     return None
 
 
-def parse_balance_intent(text: str):
-    wallet = extract_wallet_address(text)
-    match = re.search(r"(balance\s*(of)?\s*([A-Z0-9]+))|([A-Z0-9]+)\s*balance", normalize_text(text))
+def parse_balance_intent(text):
+    q = as_parsed_query(text)
+    wallet = q.wallet
+    match = BALANCE_PATTERN.search(q.upper)
     token_candidate = match.group(3) if match and match.group(3) else None
-    token = token_candidate if token_candidate and is_valid_token(token_candidate) else (extract_tokens(text)[0] if extract_tokens(text) else None)
+    token = (token_candidate and q.resolve(token_candidate)) or (q.tokens[0] if q.tokens else None)
     if wallet and token:
         return {"action": "balance", "wallet": wallet, "token": token,
                 "url": f"https://solscan.io/account/{wallet}?token={token}"}
@@ -195,10 +488,13 @@ TOKEN_TO_COINGECKO = {
     "JUP": "jupiter",
 }
 
-def parse_price_intent(text: str):
-    tokens = extract_tokens(text)  # ["ETH"] or ["JUP"], etc.
+def parse_price_intent(text):
+    tokens = as_parsed_query(text).tokens  # ["ETH"] or ["JUP"], etc.
     token = tokens[0] if tokens else "PRICE"
-    coingecko_id = TOKEN_TO_COINGECKO.get(token, "price")
+    coingecko_id = TOKEN_TO_COINGECKO.get(token)
+    if coingecko_id is None:
+        info = token_info(token)
+        coingecko_id = info.coingecko_id if info and info.coingecko_id else "price"
     return {
         "action": "price",
         "token": token,
@@ -206,33 +502,21 @@ def parse_price_intent(text: str):
     }
 
 
-def parse_transfer_intent(text: str):
-    wallet = extract_wallet_address(text)
-    amount = extract_amount(text)
-    match = re.search(r"(\d+(\.\d+)?)?\s*([A-Z0-9]+)?\s*to\s*[1-9A-HJ-NP-Za-km-z]{32,44}", normalize_text(text))
+def parse_transfer_intent(text):
+    q = as_parsed_query(text)
+    wallet = q.wallet
+    amount = q.amount
+    match = TRANSFER_PATTERN.search(q.upper)
     token_candidate = match.group(3) if match and match.group(3) else None
-    token = token_candidate if token_candidate and is_valid_token(token_candidate) else (extract_tokens(text)[0] if extract_tokens(text) else None)
+    token = (token_candidate and q.resolve(token_candidate)) or (q.tokens[0] if q.tokens else None)
     if wallet and token and amount:
         return {"action": "transfer", "wallet": wallet, "token": token, "amount": amount,
                 "url": f"https://solscan.io/account/{wallet}"}
     return None
 
 
-def parse_buy_intent(text: str):
-    domain = extract_domain(text)
-    tokens = extract_tokens(text)
-    if domain:
-        return {"action": "buy", "domain": domain,
-                "url": f"https://solscan.io/domain/{domain}"}
-    if tokens:
-        token = tokens[0]
-        return {"action": "buy", "token": token,
-                "url": f"https://jup.ag/swap/USDC-{token}"}
-    return None
-
-
-def parse_stake_intent(text: str):
-    tokens = extract_tokens(text)
+def parse_stake_intent(text):
+    tokens = as_parsed_query(text).tokens
     if tokens:
         token = tokens[0]
         if token == "BONK":
@@ -242,16 +526,17 @@ def parse_stake_intent(text: str):
     return None
 
 
-def parse_donation_intent(text: str):
-    wallet = extract_wallet_address(text)
-    tokens = extract_tokens(text)
+def parse_donation_intent(text):
+    q = as_parsed_query(text)
+    wallet = q.wallet
+    tokens = q.tokens
     return {"action": "donation", "wallet": wallet, "token": tokens,
             "url": f"https://solscan.io/account/{wallet}"} if wallet else None
 
 
 
-def parse_game_intent(text: str):
-    text_upper = normalize_text(text)
+def parse_game_intent(text):
+    text_upper = as_parsed_query(text).upper
     if "COIN" in text_upper and "FLIP" in text_upper:
         return {"action": "game", "game": "coin_flip",
                 "url": "https://dial.to/?action=solana-action%3Ahttps%3A%2F%2Fflip.sendarcade.fun%2Fapi%2Factions%2Fflip%3F_brf%3D9867785e-044d-4158-9b07-80a00db05052%26_bin%3D9f415adc-978d-4bfd-a5b8-66b0ca13f37e"}
@@ -264,8 +549,8 @@ def parse_game_intent(text: str):
     return None
 
 
-def parse_static_intent(text: str):
-    text_upper = normalize_text(text)
+def parse_static_intent(text):
+    text_upper = as_parsed_query(text).upper
     if "STAKE" in text_upper or ("LOCK" in text_upper and "BONK" in text_upper):
         return parse_stake_intent(text)
     if "KEYSTONE" in text_upper and "WALLET" in text_upper:
@@ -274,12 +559,12 @@ def parse_static_intent(text: str):
         return {"action": "static", "type": "deposit", "url": "https://lulo.fi/deposit"}
     return None
 
-def parse_domain_intent(text: str):
+def parse_domain_intent(text):
     """
     Extract a domain like abhi.sol, xyz.eth, etc., from the text.
     Returns a dict with action, domain, and URL if found.
     """
-    domain = extract_domain(text)
+    domain = as_parsed_query(text).domain
     if domain:
         return {
             "action": "domain",
@@ -288,8 +573,9 @@ def parse_domain_intent(text: str):
         }
     return None
 
-def parse_buy_intent(text: str):
-    domain = extract_domain(text)
+def parse_buy_intent(text):
+    q = as_parsed_query(text)
+    domain = q.domain
     if domain:
         return {
             "action": "buy",
@@ -297,7 +583,7 @@ def parse_buy_intent(text: str):
             "url": f"https://solscan.io/domain/{domain}"
         }
 
-    tokens = extract_tokens(text)
+    tokens = q.tokens
     if tokens:
         token = tokens[0]  
         return {
@@ -309,33 +595,58 @@ def parse_buy_intent(text: str):
     return None
 
 def parse_intent(intent: str, text: str) -> Optional[Dict]:
-    static_result = parse_static_intent(text)
+    q = as_parsed_query(text)
+    with metrics.stage("parse"):
+        result = _parse_intent(intent, q)
+    if result and q.corrections:
+        # Say which of the symbols in the result were typo-corrected, so
+        # callers can confirm low-confidence ones.
+        used = set()
+        for value in result.values():
+            used.update(value if isinstance(value, list) else [value])
+        corrections = [
+            {"input": word, "token": c.symbol, "distance": c.distance, "confidence": c.confidence}
+            for word, c in q.corrections.items() if c.symbol in used
+        ]
+        if corrections:
+            result["corrections"] = corrections
+    return result
+
+def _parse_intent(intent: str, q: ParsedQuery) -> Optional[Dict]:
+    static_result = parse_static_intent(q)
     if static_result:
         return static_result
 
     i = intent.lower() if intent else ""
     if i == "swap":
-        return parse_swap_intent(text)
+        return parse_swap_intent(q)
     if i == "balance":
-        return parse_balance_intent(text)
+        return parse_balance_intent(q)
     if i == "price":
-        return parse_price_intent(text)
+        return parse_price_intent(q)
     if i == "domain":
-        return parse_domain_intent(text)
+        return parse_domain_intent(q)
     if i == "transfer":
-        return parse_transfer_intent(text)
+        return parse_transfer_intent(q)
     if i == "buy":
-        if extract_domain(text):
-            return parse_domain_intent(text)
-        return parse_buy_intent(text)
+        if q.domain:
+            return parse_domain_intent(q)
+        return parse_buy_intent(q)
     if i == "stake":
-        return parse_stake_intent(text)
+        return parse_stake_intent(q)
     if i == "donation":
-        return parse_donation_intent(text)
+        return parse_donation_intent(q)
     if i == "game":
-        return parse_game_intent(text)
+        return parse_game_intent(q)
 
     return {"error": f"Unknown intent: {intent}"}
 
+def parse_intents(intents: List[Optional[str]], texts: List[str]) -> List[Optional[Dict]]:
+    """Batch counterpart of parse_intent; results follow the order of `texts`."""
+    return [
+        parse_intent(intent, text) if intent else {"error": "Could not classify intent"}
+        for intent, text in zip(intents, texts)
+    ]
+
 if PRELOAD_TOKENS:
     load_cached_tokens()
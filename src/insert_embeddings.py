@@ -1,38 +1,115 @@
 import sys, os, json
+import argparse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.intent_recognition import index
-from src.embeddings import generate_embedding
+from src.config import (
+    VECTOR_BACKEND, EMBEDDING_MODEL_KEY, PINECONE_INDEX_NAME,
+    EMBED_BATCH_SIZE, UPSERT_BATCH_SIZE, UPSERT_WORKERS, UPSERT_MANIFEST_FILE,
+)
+from src.intent_recognition import get_index
+from src.embeddings import encode_examples
+from src.vector_index import load_examples
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 UPSERT_FILE = os.path.join(ROOT, "data", "upsert.json")
 
 
-def upsert_intents(filepath: str = UPSERT_FILE):
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _manifest_key() -> str:
+    # Vectors from a different model or index cannot be reused.
+    return hashlib.sha256(f"{EMBEDDING_MODEL_KEY}\x00{PINECONE_INDEX_NAME}".encode("utf-8")).hexdigest()
+
+
+def load_manifest(filepath: str = UPSERT_MANIFEST_FILE) -> Optional[set]:
+    """IDs that are already in the index, or None if the manifest is missing or stale."""
+    try:
+        with open(filepath, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("key") != _manifest_key():
+        return None
+    return set(manifest.get("ids", []))
+
+
+def save_manifest(ids, filepath: str = UPSERT_MANIFEST_FILE):
+    tmp = filepath + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"key": _manifest_key(), "ids": sorted(ids)}, f, indent=2)
+    os.replace(tmp, filepath)
+
+
+def upsert_intents(filepath: str = UPSERT_FILE, full: bool = False,
+                   batch_size: int = EMBED_BATCH_SIZE, upsert_batch_size: int = UPSERT_BATCH_SIZE,
+                   workers: int = UPSERT_WORKERS):
     """
     Load training examples from a JSON file and insert them into Pinecone.
+
+    Vector IDs are content hashes, so a re-run only embeds and upserts
+    examples that were added or edited, and deletes the IDs of examples
+    that were removed. `full=True` wipes the index and starts over, and
+    so does a run without a valid manifest: the index may then hold
+    vectors we cannot name, such as the positional `swap_0`-style IDs of
+    older versions or vectors from another model.
     """
     path = Path(filepath)
     if not path.exists():
         raise FileNotFoundError(f"Intent file {filepath} not found.")
-    
-    with open(path, "r") as f:
-        intents = json.load(f)
+
+    if VECTOR_BACKEND == "local":
+        # The local index re-encodes itself from upsert.json whenever the
+        # file changes, so there is nothing to push.
+        print(f"VECTOR_BACKEND=local: local index holds {len(get_index())} examples.")
+        return
+
+    index = get_index()
+    ids, intents, texts = load_examples(filepath)
+
+    existing = None if full else load_manifest()
+    if existing is None:
+        if not full:
+            print("No upsert manifest for this model and index; replacing every vector in the index.")
+        index.delete(delete_all=True)
+        existing = set()
+
+    current = set(ids)
+    added = [i for i, vid in enumerate(ids) if vid not in existing]
+    removed = sorted(existing - current)
+    print(f"{len(added)} examples to upsert, {len(removed)} to delete, {len(current) - len(added)} unchanged.")
 
     vectors = []
-    for intent, examples in intents.items():
-        for i, example in enumerate(examples):
-            embedding = generate_embedding(example)
-            vectors.append((f"{intent}_{i}", embedding, {"intent": intent}))
+    if added:
+        embeddings = encode_examples([texts[i] for i in added], batch_size=batch_size)
+        vectors = [
+            (ids[i], embedding.tolist(), {"intent": intents[i]})
+            for i, embedding in zip(added, embeddings)
+        ]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        jobs = [pool.submit(index.upsert, vectors=chunk) for chunk in _chunks(vectors, upsert_batch_size)]
+        jobs += [pool.submit(index.delete, ids=chunk) for chunk in _chunks(removed, upsert_batch_size)]
+        for job in jobs:
+            job.result()
 
-    if vectors:
-        index.upsert(vectors=vectors)
+    save_manifest(current)
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full", action="store_true", help="Delete every vector and upsert all examples again")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Examples per forward pass")
+    args = parser.parse_args()
+
     print("Starting upsert...")
-    upsert_intents()
+    upsert_intents(full=args.full, batch_size=args.batch_size)
     print("Intents have been upserted into Pinecone!")
 
 
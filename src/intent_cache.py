@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable, Optional
+
+from src.config import (
+    INTENT_CACHE_TTL, INTENT_CACHE_MAX_ENTRIES,
+    EMBEDDING_MODEL_KEY, VECTOR_BACKEND, UPSERT_FILE,
+)
+from src.entities import ADDRESS_PATTERN, AMOUNT_PATTERN, DOMAIN_PATTERN
+
+
+def canonicalize(query: str) -> str:
+    """
+    Template of a query: amounts, base58 addresses and domains become
+    placeholders, case and whitespace are normalized. Queries with the same
+    template get the same intent. Uses the patterns the entity parser
+    extracts those parameters with.
+    """
+    text = ADDRESS_PATTERN.sub("<addr>", query)
+    text = DOMAIN_PATTERN.sub("<domain>", text)
+    text = AMOUNT_PATTERN.sub("<num>", text)
+    return " ".join(text.lower().split())
+
+
+def _namespace() -> str:
+    # Results are only valid for the model and training data that produced them.
+    h = hashlib.sha256(f"{EMBEDDING_MODEL_KEY}\x00{VECTOR_BACKEND}".encode("utf-8"))
+    try:
+        with open(UPSERT_FILE, "rb") as f:
+            h.update(f.read())
+    except OSError:
+        pass
+    return h.hexdigest()[:16]
+
+
+class IntentCache:
+    """
+    Template -> intent cache in a SQLite file, shared by every process that
+    opens the same path (uvicorn workers, the replay CLI). Entries expire
+    after `ttl` seconds and the table is trimmed to `max_entries`.
+
+    Writes are buffered and committed together by a background timer
+    FLUSH_AFTER seconds after the first one, so a miss never waits on a
+    commit. Buffered entries are already visible to `get` in this process.
+    """
+
+    PRUNE_EVERY = 1000
+    FLUSH_AFTER = 1.0
+
+    def __init__(self, path: str, ttl: float = INTENT_CACHE_TTL, max_entries: int = INTENT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.namespace = _namespace()
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        # Reads and the flush use separate connections (WAL lets them run
+        # side by side), so a commit never blocks a request's lookup.
+        self._flush_lock = threading.Lock()
+        self._db = None
+        self._write_db = None
+        self._pid = None
+        # template key -> (intent, created), not committed yet
+        self._pending = {}
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS intents ("
+            " template TEXT PRIMARY KEY, intent TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS intents_created ON intents (created)")
+        db.commit()
+        return db
+
+    def _check_fork(self):
+        # Connections and the timer thread must not cross a fork, so each
+        # process opens its own. Call with `_lock` held.
+        if self._pid != os.getpid():
+            self._db = self._write_db = self._timer = None
+            self._pid = os.getpid()
+
+    def _conn(self) -> sqlite3.Connection:
+        self._check_fork()
+        if self._db is None:
+            self._db = self._open()
+        return self._db
+
+    def _key(self, query: str) -> str:
+        return f"{self.namespace}:{canonicalize(query)}"
+
+    def get(self, query: str) -> Optional[str]:
+        key = self._key(query)
+        try:
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is not None:
+                    row = pending[:1]
+                else:
+                    row = self._conn().execute(
+                        "SELECT intent FROM intents WHERE template = ? AND created > ?",
+                        (key, time.time() - self.ttl),
+                    ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Intent cache read failed: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put_many(self, items: Iterable):
+        now = time.time()
+        rows = {self._key(q): (intent, now) for q, intent in items if intent}
+        if not rows:
+            return
+        with self._lock:
+            self._check_fork()
+            self._pending.update(rows)
+            if self._timer is None:
+                self._timer = threading.Timer(self.FLUSH_AFTER, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Commit the buffered writes in one transaction."""
+        with self._flush_lock:
+            with self._lock:
+                self._check_fork()
+                rows = [(key, intent, created) for key, (intent, created) in self._pending.items()]
+                if self._write_db is None and rows:
+                    self._write_db = self._open()
+                db = self._write_db
+                self._timer = None
+            if not rows:
+                return
+            try:
+                db.executemany("INSERT OR REPLACE INTO intents (template, intent, created) VALUES (?, ?, ?)", rows)
+                db.commit()
+                self._writes += len(rows)
+                if self._writes >= self.PRUNE_EVERY:
+                    self._writes = 0
+                    self._prune(db)
+            except sqlite3.Error as e:
+                print(f"Intent cache write failed: {e}")
+            finally:
+                # Dropped only now, so `get` keeps seeing them until they are on disk.
+                with self._lock:
+                    for key, intent, created in rows:
+                        if self._pending.get(key) == (intent, created):
+                            del self._pending[key]
+
+    def put(self, query: str, intent: Optional[str]):
+        self.put_many([(query, intent)])
+
+    def _prune(self, db: sqlite3.Connection):
+        db.execute("DELETE FROM intents WHERE created <= ?", (time.time() - self.ttl,))
+        db.execute(
+            "DELETE FROM intents WHERE template IN ("
+            " SELECT template FROM intents ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        db.commit()
+
+    def stats(self) -> dict:
+        try:
+            with self._lock:
+                size = self._conn().execute("SELECT COUNT(*) FROM intents").fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+def read_query_log(path: str) -> Iterable[str]:
+    """Queries from a log: JSONL lines with a "query" field, or one plain query per line."""
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    query = json.loads(line).get("query")
+                except ValueError:
+                    continue
+                if query:
+                    yield query
+            else:
+                yield line
+
+
+def prewarm(cache: IntentCache, path: str, classify_many, batch_size: int = 256) -> int:
+    """
+    Classify every template from a query log that is not cached yet.
+    `classify_many(queries) -> intents` does the work (and fills the cache).
+    Returns the number of templates classified.
+    """
+    seen = set()
+    batch = []
+    done = 0
+    for query in read_query_log(path):
+        template = canonicalize(query)
+        if template in seen:
+            continue
+        seen.add(template)
+        if cache.get(query) is None:
+            batch.append(query)
+        if len(batch) >= batch_size:
+            classify_many(batch)
+            done += len(batch)
+            batch = []
+    if batch:
+        classify_many(batch)
+        done += len(batch)
+    return done
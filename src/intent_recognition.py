@@ -1,14 +1,77 @@
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
-from src.config import PINECONE_API_KEY, PINECONE_INDEX_NAME, EMBEDDING_MODEL_NAME
+import threading
+from src.config import (
+    PINECONE_API_KEY, PINECONE_INDEX_NAME, EMBEDDING_MODEL_KEY, EMBEDDING_DIM,
+    VECTOR_BACKEND, UPSERT_FILE, LOCAL_INDEX_FILE, CASCADE_ENABLED,
+    INTENT_CACHE_ENABLED, INTENT_CACHE_FILE,
+    EMBED_CONCURRENCY, EMBED_QUEUE_SIZE, EMBED_QUEUE_TIMEOUT_MS, RETRY_AFTER_SECONDS,
+)
+from src.admission import Gate, Overloaded
+from src.models import get_model, is_loaded
+from src import cascade, metrics
+from src.intent_cache import IntentCache
+from src.embeddings import encode_query, generate_embeddings
+from src.vector_index import query_many
+from typing import List, Optional
 import re
 
 
-_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
+_index = None
+_index_lock = threading.Lock()
+
+intent_cache = IntentCache(INTENT_CACHE_FILE) if INTENT_CACHE_ENABLED else None
+
+# Bounds how many queries are in encode + index query at once (see config).
+embed_gate = Gate("embedding", EMBED_CONCURRENCY, EMBED_QUEUE_SIZE, EMBED_QUEUE_TIMEOUT_MS / 1000, RETRY_AFTER_SECONDS)
+
+
+def _build_index():
+    if VECTOR_BACKEND == "local":
+        from src.vector_index import LocalIndex
+        return LocalIndex.load(
+            UPSERT_FILE, LOCAL_INDEX_FILE,
+            lambda texts: get_model().encode(texts),
+            EMBEDDING_MODEL_KEY,
+        )
+
+    from pinecone import Pinecone
+    from src.resilience import ResilientIndex
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index = ResilientIndex(pc.Index(PINECONE_INDEX_NAME))
+    check_dimension(index)
+    return index
+
+
+def check_dimension(index):
+    """
+    Refuse a Pinecone index whose dimension differs from the vectors the
+    model produces (EMBEDDING_DIM truncation, another model), which would
+    otherwise fail every query. An unreachable index is left to the query
+    path, which degrades instead of failing startup.
+    """
+    expected = EMBEDDING_DIM or (get_model().get_sentence_embedding_dimension() if is_loaded() else 0)
+    if not expected:
+        return
+    try:
+        stats = index.describe_index_stats()
+    except Exception as e:
+        print(f"Could not check the dimension of Pinecone index {PINECONE_INDEX_NAME}: {e}")
+        return
+    dimension = stats.get("dimension") if isinstance(stats, dict) else getattr(stats, "dimension", None)
+    if dimension and dimension != expected:
+        raise ValueError(
+            f"Pinecone index {PINECONE_INDEX_NAME} has dimension {dimension} but the model produces {expected}; "
+            f"unset EMBEDDING_DIM or upsert into an index with {expected} dimensions"
+        )
+
+
+def get_index():
+    """Return the vector index, connecting (or loading it) on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _build_index()
+    return _index
 
 
 STATIC_KEYWORDS = {
@@ -23,7 +86,11 @@ STATIC_KEYWORDS = {
 
 DOMAIN_PATTERN = re.compile(r"\b[\w\d-]+\.(sol|eth|degen|monad|letsbonk)\b", re.IGNORECASE)
 
-def classify_intent(query: str):
+PRICE_PATTERN = re.compile(r"\b(price of|what is the price of)\b")
+
+
+def match_rules(query: str):
+    """Keyword rules that decide an intent without touching the model."""
     q_lower = query.lower()
 
 
@@ -44,13 +111,133 @@ def classify_intent(query: str):
             return "static"
 
 
-    if re.search(r"\b(price of|what is the price of)\b", q_lower):
+    if PRICE_PATTERN.search(q_lower):
         return "price"
 
-    embedding = _model.encode(query).tolist()
-    result = index.query(vector=embedding, top_k=1, include_metadata=True)
+    return None
+
 
+def _intent_from(result):
     if result["matches"]:
         return result["matches"][0]["metadata"]["intent"]
-
     return None
+
+
+def classify_embedding(query: str):
+    """
+    The full path: embed the query and take the intent of the nearest example.
+    Raises Overloaded when embed_gate has no room, and its subclass
+    IndexUnavailable when Pinecone is failing.
+    """
+    with embed_gate.slot():
+        with metrics.stage("encode"):
+            embedding = encode_query(query).tolist()
+        with metrics.stage("index_query"):
+            result = get_index().query(vector=embedding, top_k=1, include_metadata=True)
+    return _intent_from(result)
+
+
+def classify_intent(query: str):
+    with metrics.stage("rules"):
+        intent = match_rules(query)
+    if intent:
+        metrics.count("blinkbot_intent_decisions_total", path="rules")
+        return intent
+
+    if intent_cache is not None:
+        with metrics.stage("intent_cache"):
+            intent = intent_cache.get(query)
+        metrics.count("blinkbot_cache_requests_total", cache="intent", result="hit" if intent else "miss")
+        if intent:
+            metrics.count("blinkbot_intent_decisions_total", path="intent_cache")
+            return intent
+        intent = _classify_model(query)
+        intent_cache.put(query, intent)
+        return intent
+
+    return _classify_model(query)
+
+
+def _classify_model(query: str):
+    guess = None
+    if CASCADE_ENABLED:
+        with metrics.stage("cascade"):
+            guess, _, confident = cascade.predict(query)
+        if confident:
+            metrics.count("blinkbot_intent_decisions_total", path="cascade")
+            if cascade.should_shadow():
+                try:
+                    cascade.record_agreement(guess, classify_embedding(query), answered=True)
+                except Overloaded:
+                    pass
+            return guess
+
+    try:
+        intent = classify_embedding(query)
+    except Overloaded as e:
+        # Under pressure, or with the index down, the first-stage guess,
+        # however unsure, beats no answer.
+        if guess is None:
+            guess, _ = cascade.get_classifier().predict(query)
+        e.fallback = guess
+        metrics.count("blinkbot_intent_decisions_total", path="degraded" if guess else "rejected")
+        raise
+    if CASCADE_ENABLED:
+        cascade.record_agreement(guess, intent, answered=False)
+    metrics.count("blinkbot_intent_decisions_total", path="embedding")
+    return intent
+
+
+def classify_intents(queries: List[str]) -> List[Optional[str]]:
+    """
+    Classify many queries at once: rules first, then the intent cache and the
+    first-stage classifier, then a single batched encode and one
+    multi-vector index query for whatever is left.
+    Results follow the order of `queries`. Raises Overloaded when
+    embed_gate has no room.
+    """
+    with metrics.stage("rules"):
+        intents = [match_rules(q) for q in queries]
+    pending = [i for i, intent in enumerate(intents) if not intent]
+    metrics.count("blinkbot_intent_decisions_total", len(queries) - len(pending), path="rules")
+
+    if intent_cache is not None and pending:
+        with metrics.stage("intent_cache"):
+            for i in pending:
+                intents[i] = intent_cache.get(queries[i])
+        hits = sum(1 for i in pending if intents[i])
+        metrics.count("blinkbot_cache_requests_total", hits, cache="intent", result="hit")
+        metrics.count("blinkbot_cache_requests_total", len(pending) - hits, cache="intent", result="miss")
+        metrics.count("blinkbot_intent_decisions_total", hits, path="intent_cache")
+        pending = [i for i in pending if not intents[i]]
+    to_cache = list(pending)
+
+    guesses = {}
+    if CASCADE_ENABLED and pending:
+        deferred = []
+        with metrics.stage("cascade"):
+            for i in pending:
+                guess, _, confident = cascade.predict(queries[i])
+                if confident:
+                    intents[i] = guess
+                else:
+                    guesses[i] = guess
+                    deferred.append(i)
+        metrics.count("blinkbot_intent_decisions_total", len(pending) - len(deferred), path="cascade")
+        pending = deferred
+
+    if pending:
+        with embed_gate.slot():
+            with metrics.stage("encode"):
+                embeddings = generate_embeddings([queries[i] for i in pending], queries=True)
+            with metrics.stage("index_query"):
+                results = query_many(get_index(), embeddings, top_k=1)
+        metrics.count("blinkbot_intent_decisions_total", len(pending), path="embedding")
+        for i, result in zip(pending, results):
+            intents[i] = _intent_from(result)
+            if i in guesses:
+                cascade.record_agreement(guesses[i], intents[i], answered=False)
+
+    if intent_cache is not None and to_cache:
+        intent_cache.put_many((queries[i], intents[i]) for i in to_cache)
+    return intents
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Iterable, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import (
+    LITE_SEARCH_URL, JUPITER_TIMEOUT, JUPITER_QUERY_BUDGET,
+    JUPITER_NEGATIVE_TTL, JUPITER_MAX_WORKERS, JUPITER_CACHE_SIZE,
+)
+from src import metrics
+
+
+_session = None
+_session_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=JUPITER_MAX_WORKERS, thread_name_prefix="jupiter")
+
+# symbol -> monotonic expiry of a "not a token" answer, oldest first
+_negative = OrderedDict()
+# symbol -> expiry of a "found" answer that arrived after its query gave up
+_late_found = OrderedDict()
+# symbol -> Future of a lookup that is already running
+_inflight = {}
+_lock = threading.Lock()
+
+_stats = {
+    "requests": 0, "found": 0, "misses": 0, "errors": 0,
+    "negative_hits": 0, "budget_expired": 0, "late_hits": 0,
+}
+
+
+def _count(key: str, amount: int = 1):
+    with _lock:
+        _stats[key] += amount
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=JUPITER_MAX_WORKERS)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _remember(cache: OrderedDict, symbol: str):
+    now = time.monotonic()
+    with _lock:
+        cache[symbol] = now + JUPITER_NEGATIVE_TTL
+        cache.move_to_end(symbol)
+        # All entries share one TTL, so the front is both oldest and first to expire.
+        while cache and (len(cache) > JUPITER_CACHE_SIZE or next(iter(cache.values())) < now):
+            cache.popitem(last=False)
+
+
+def _is_known_miss(symbol: str) -> bool:
+    with _lock:
+        expiry = _negative.get(symbol)
+        if expiry is None:
+            return False
+        if expiry < time.monotonic():
+            del _negative[symbol]
+            return False
+        return True
+
+
+def _take_late_hit(symbol: str) -> bool:
+    with _lock:
+        expiry = _late_found.pop(symbol, None)
+    return expiry is not None and expiry >= time.monotonic()
+
+
+def _keep_late_hit(symbol: str, future):
+    if not future.cancelled() and future.exception() is None and future.result():
+        _remember(_late_found, symbol)
+
+
+def search_jupiter_lite(symbol: str) -> bool:
+    """Ask Jupiter's lite-search whether `symbol` is a token. Misses are remembered for JUPITER_NEGATIVE_TTL."""
+    s = symbol.upper()
+    if _is_known_miss(s):
+        _count("negative_hits")
+        metrics.count("blinkbot_jupiter_requests_total", result="negative_cache")
+        return False
+
+    _count("requests")
+    try:
+        resp = _get_session().get(LITE_SEARCH_URL + s, timeout=JUPITER_TIMEOUT)
+        if resp.status_code != 200:
+            _count("errors")
+            metrics.count("blinkbot_jupiter_requests_total", result="error")
+            return False
+        for token in resp.json():
+            if token.get("symbol", "").upper() == s:
+                _count("found")
+                metrics.count("blinkbot_jupiter_requests_total", result="found")
+                return True
+    except Exception as e:
+        # Timeouts and connection errors say nothing about the symbol, so
+        # they are not cached.
+        _count("errors")
+        timeout = isinstance(e, requests.Timeout)
+        metrics.count("blinkbot_jupiter_requests_total", result="timeout" if timeout else "error")
+        return False
+
+    _count("misses")
+    metrics.count("blinkbot_jupiter_requests_total", result="miss")
+    _remember(_negative, s)
+    return False
+
+
+def _submit(symbol: str):
+    with _lock:
+        future = _inflight.get(symbol)
+        if future is None:
+            future = _executor.submit(search_jupiter_lite, symbol)
+            _inflight[symbol] = future
+            future.add_done_callback(lambda _: _inflight.pop(symbol, None))
+    return future
+
+
+def lookup_many(symbols: Iterable[str], budget: float = JUPITER_QUERY_BUDGET) -> Set[str]:
+    """
+    Look up all `symbols` concurrently and return the ones Jupiter knows.
+
+    Waits at most `budget` seconds in total; anything still unresolved is
+    treated as "not a token" for this query. The lookup keeps running: a
+    miss is negative-cached, and a hit is kept for the next query that asks
+    about the symbol.
+    """
+    found = set()
+    pending = {}
+    for symbol in dict.fromkeys(s.upper() for s in symbols):
+        if _take_late_hit(symbol):
+            _count("late_hits")
+            metrics.count("blinkbot_jupiter_requests_total", result="late_hit")
+            found.add(symbol)
+            continue
+        if _is_known_miss(symbol):
+            _count("negative_hits")
+            metrics.count("blinkbot_jupiter_requests_total", result="negative_cache")
+            continue
+        pending[symbol] = _submit(symbol)
+    if not pending:
+        return found
+
+    with metrics.stage("jupiter"):
+        done, not_done = wait(pending.values(), timeout=budget)
+    if not_done:
+        _count("budget_expired", len(not_done))
+        metrics.count("blinkbot_jupiter_requests_total", len(not_done), result="budget_expired")
+        for symbol, future in pending.items():
+            if future in not_done:
+                future.add_done_callback(lambda f, s=symbol: _keep_late_hit(s, f))
+    return found | {symbol for symbol, future in pending.items() if future in done and future.result()}
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_stats, negative_cache_size=len(_negative), late_hits_waiting=len(_late_found), inflight=len(_inflight))
@@ -0,0 +1,382 @@
+import sys, os
+import json
+import time
+import zlib
+import random
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import requests
+
+from src.config import UPSERT_FILE
+
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for the SentenceTransformer: hashed character
+    trigrams, so similar texts get similar vectors and everything around
+    the model can be exercised without torch. The pytest benchmarks use it
+    too (src/tests/conftest.py).
+    """
+
+    dim = 384
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        import numpy as np
+
+        single = isinstance(texts, str)
+        rows = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            padded = f"  {text.lower()} "
+            for i in range(len(padded) - 2):
+                rows[row, zlib.crc32(padded[i:i + 3].encode()) % self.dim] += 1.0
+        return rows[0] if single else rows
+
+
+class _JupiterHandler(BaseHTTPRequestHandler):
+    known = frozenset()
+    latency = 0.0
+
+    def do_GET(self):
+        symbol = parse_qs(urlparse(self.path).query).get("query", [""])[0].upper()
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps([{"symbol": symbol}] if symbol in self.known else []).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_jupiter(known=(), latency: float = 0.0):
+    """Serve a lite-search lookalike on a free local port; returns (server, LITE_SEARCH_URL)."""
+    handler = type("Handler", (_JupiterHandler,), {"known": frozenset(s.upper() for s in known), "latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-jupiter", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/tokens/v2/search?query="
+
+
+class QueryMix:
+    """Queries drawn from data/upsert.json, with per-intent weights (default: as many as it has examples)."""
+
+    def __init__(self, path: str = UPSERT_FILE, weights: Optional[Dict[str, float]] = None, seed: int = 0):
+        with open(path, "r") as f:
+            examples = {intent: texts for intent, texts in json.load(f).items() if texts}
+        weights = weights or {intent: len(texts) for intent, texts in examples.items()}
+        unknown = set(weights) - set(examples)
+        if unknown:
+            raise ValueError(f"No examples for intents: {', '.join(sorted(unknown))}")
+        self.examples = examples
+        self.intents = [i for i in weights if weights[i] > 0]
+        self.weights = [weights[i] for i in self.intents]
+        self._rng = random.Random(seed)
+
+    def sample(self) -> str:
+        intent = self._rng.choices(self.intents, self.weights)[0]
+        return self._rng.choice(self.examples[intent])
+
+
+def parse_mix(text: str) -> Optional[Dict[str, float]]:
+    """"swap=4,price=1" -> {"swap": 4.0, "price": 1.0}"""
+    if not text:
+        return None
+    mix = {}
+    for part in text.split(","):
+        intent, _, weight = part.partition("=")
+        mix[intent.strip()] = float(weight or 1)
+    return mix
+
+
+def _children(pid: int) -> List[int]:
+    pids = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return pids
+
+
+def process_usage(pid: int) -> Optional[dict]:
+    """CPU seconds and RSS/PSS (MB) of `pid` and its children, from /proc; None elsewhere."""
+    if not os.path.isdir("/proc"):
+        return None
+    cpu = rss = pss = 0.0
+    for p in [pid] + _children(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1]) / 1024
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1]) / 1024
+        except (OSError, IndexError, ValueError):
+            pass
+    return {"cpu_seconds": cpu, "rss_mb": rss, "pss_mb": pss}
+
+
+def run_load(url: str, mix: QueryMix, rate: float, duration: float, max_in_flight: int = 512) -> List[tuple]:
+    """
+    Open-loop load: request i is due at start + i / rate whether or not
+    earlier ones have finished. Latency is measured from that due time, so
+    a backed-up server (or generator) shows up in the numbers instead of
+    quietly lowering the offered rate. Returns (status, seconds) per request;
+    status 0 is a connection error or timeout.
+    """
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def send(due: float, query: str):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            status = session.post(url, json={"query": query}, timeout=30).status_code
+        except requests.RequestException:
+            status = 0
+        with lock:
+            results.append((status, time.perf_counter() - due))
+
+    total = int(rate * duration)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        start = time.perf_counter()
+        for i in range(total):
+            due = start + i / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, due, mix.sample())
+    return results
+
+
+def summarize(results: List[tuple], duration: float) -> dict:
+    latencies = sorted(seconds for status, seconds in results if status == 200)
+    errors = {}
+    for status, _ in results:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+
+    return {
+        "sent": len(results),
+        "ok": len(latencies),
+        "throughput": round(len(latencies) / duration, 1),
+        "error_rate": round(1 - len(latencies) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+def start_server(workers: int, port: int, env: dict, fake_model: bool, cpus: Optional[List[int]]) -> subprocess.Popen:
+    cmd = [sys.executable, os.path.abspath(__file__), "serve", "--workers", str(workers), "--port", str(port)]
+    if fake_model:
+        cmd.append("--fake-model")
+    if cpus:
+        cmd += ["--cpus", ",".join(map(str, cpus))]
+    return subprocess.Popen(cmd, env=env, cwd=ROOT)
+
+
+def wait_ready(base_url: str, proc: subprocess.Popen, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with status {proc.returncode}")
+        try:
+            if requests.get(base_url + "/ready", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def rates_for(args) -> List[float]:
+    if args.mode == "constant":
+        return [args.rate]
+    if args.steps < 2:
+        return [args.max_rate]
+    step = (args.max_rate - args.rate) / (args.steps - 1)
+    return [round(args.rate + i * step, 2) for i in range(args.steps)]
+
+
+def benchmark(args) -> List[dict]:
+    stub, lite_url = start_stub_jupiter(latency=args.jupiter_latency_ms / 1000)
+    scratch = tempfile.mkdtemp(prefix="blinkbot-loadtest-")
+    env = dict(
+        os.environ,
+        VECTOR_BACKEND="local",
+        LITE_SEARCH_URL=lite_url,
+        TOKEN_RELOAD_INTERVAL="0",
+        # Keep the stand-ins' output out of data/.
+        LOCAL_INDEX_FILE=os.path.join(scratch, "upsert_embeddings.npz") if args.fake_model else
+        os.environ.get("LOCAL_INDEX_FILE", os.path.join(ROOT, "data", "upsert_embeddings.npz")),
+        EMBEDDING_CACHE_FILE="",
+        INTENT_CACHE_FILE=os.path.join(scratch, "intent_cache.sqlite3"),
+        INTENT_CACHE_ENABLED="1" if args.with_caches else "0",
+        EMBEDDING_CACHE_SIZE=os.environ.get("EMBEDDING_CACHE_SIZE", "10000") if args.with_caches else "0",
+    )
+    mix = QueryMix(weights=parse_mix(args.mix), seed=args.seed)
+    cpu_count = os.cpu_count() or 1
+    rows = []
+
+    for workers in args.workers:
+        cpus = list(range(min(workers, cpu_count))) if args.pin else None
+        if cpus and cpu_count > len(cpus):
+            os.sched_setaffinity(0, set(range(len(cpus), cpu_count)))
+        proc = start_server(workers, args.port, env, args.fake_model, cpus)
+        base = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_ready(base, proc)
+            if args.warmup > 0:
+                run_load(base + "/process", mix, rates_for(args)[0], args.warmup)
+            for rate in rates_for(args):
+                before = process_usage(proc.pid)
+                start = time.perf_counter()
+                results = run_load(base + "/process", mix, rate, args.duration)
+                elapsed = time.perf_counter() - start
+                after = process_usage(proc.pid)
+                row = {"workers": workers, "offered_rps": rate, **summarize(results, elapsed)}
+                if before and after:
+                    row["cpu_cores"] = round((after["cpu_seconds"] - before["cpu_seconds"]) / elapsed, 2)
+                    row["rss_mb"] = round(after["rss_mb"], 1)
+                    row["pss_mb"] = round(after["pss_mb"], 1)
+                rows.append(row)
+                print_row(row)
+        finally:
+            stop_server(proc)
+    stub.shutdown()
+    return rows
+
+
+HEADER = f"{'workers':>7} {'offered':>8} {'achieved':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7} {'cores':>6} {'rss MB':>7} {'pss MB':>7}"
+
+
+def print_row(row: dict):
+    def f(key, fmt):
+        value = row.get(key)
+        return format(value, fmt) if value is not None else "-"
+
+    print(
+        f"{row['workers']:>7} {row['offered_rps']:>8.1f} {row['throughput']:>9.1f} {f('p50_ms', '>8.1f')} "
+        f"{f('p90_ms', '>8.1f')} {f('p99_ms', '>8.1f')} {f('max_ms', '>8.1f')} {row['error_rate']:>7.1%} "
+        f"{f('cpu_cores', '>6.2f')} {f('rss_mb', '>7.0f')} {f('pss_mb', '>7.0f')}",
+        flush=True,
+    )
+
+
+def saturation(rows: List[dict], slo_ms: float, max_error_rate: float = 0.01) -> Dict[int, Optional[dict]]:
+    """Per worker count, the row with the highest throughput that kept p99 within `slo_ms`, errors low and up with the offered rate."""
+    best = {}
+    for row in rows:
+        ok = (
+            row["p99_ms"] is not None and row["p99_ms"] <= slo_ms
+            and row["error_rate"] <= max_error_rate
+            and row["throughput"] >= 0.95 * row["offered_rps"]
+        )
+        current = best.setdefault(row["workers"], None)
+        if ok and (current is None or row["throughput"] > current["throughput"]):
+            best[row["workers"]] = row
+    return best
+
+
+def serve_main(args):
+    if args.cpus:
+        os.sched_setaffinity(0, {int(c) for c in args.cpus.split(",")})
+    if args.fake_model:
+        from src import models
+        from src.config import EMBEDDING_MODEL_KEY
+        models._models[EMBEDDING_MODEL_KEY] = HashingEncoder()
+    from src import prefork
+    prefork.serve("127.0.0.1", args.port, args.workers, "warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test of src.server:app with local stand-ins")
+    sub = parser.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="Start the server per worker count and drive load at it (default)")
+    run.add_argument("--workers", default="1", help="Comma-separated worker counts to test, e.g. 1,2,4")
+    run.add_argument("--mode", choices=("constant", "ramp"), default="constant")
+    run.add_argument("--rate", type=float, default=50, help="Requests/s (ramp: starting rate)")
+    run.add_argument("--max-rate", type=float, default=500, help="Ramp: final rate")
+    run.add_argument("--steps", type=int, default=5, help="Ramp: number of rates between --rate and --max-rate")
+    run.add_argument("--duration", type=float, default=30, help="Seconds per rate")
+    run.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds at the first rate")
+    run.add_argument("--mix", default="", help='Intent weights, e.g. "swap=4,price=2,buy=1" (default: as in upsert.json)')
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--slo-ms", type=float, default=200, help="p99 target used to report the saturation point")
+    run.add_argument("--jupiter-latency-ms", type=float, default=50, help="Latency of the stub Jupiter API")
+    run.add_argument("--with-caches", action="store_true", help="Keep the embedding and intent caches on")
+    run.add_argument("--fake-model", action="store_true", help="Hashed trigram encoder instead of the transformer")
+    run.add_argument("--pin", action="store_true", help="Pin the server to the first N cores and the generator to the rest")
+    run.add_argument("--port", type=int, default=8799)
+    run.add_argument("--json", help="Also write all result rows here")
+
+    serve = sub.add_parser("serve", help=argparse.SUPPRESS)
+    serve.add_argument("--workers", type=int, default=1)
+    serve.add_argument("--port", type=int, default=8799)
+    serve.add_argument("--fake-model", action="store_true")
+    serve.add_argument("--cpus", default="")
+
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in ("run", "serve", "-h", "--help"):
+        argv = ["run"] + argv
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve_main(args)
+        return
+
+    args.workers = [int(w) for w in args.workers.split(",") if w.strip()]
+    print(HEADER)
+    rows = benchmark(args)
+    print(f"\nSaturation (highest throughput with p99 <= {args.slo_ms:.0f} ms and < 1% errors):")
+    for workers, row in saturation(rows, args.slo_ms).items():
+        if row is None:
+            print(f"  {workers} workers: not reached at the tested rates")
+            continue
+        rps = row["throughput"]
+        per_core = f", {rps / row['cpu_cores']:.1f} per busy core" if row.get("cpu_cores") else ""
+        print(f"  {workers} workers: {rps:.1f} req/s ({rps / workers:.1f} per worker{per_core})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
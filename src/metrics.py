@@ -0,0 +1,157 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional, Tuple
+
+from src.config import METRICS_ENABLED
+
+
+# Seconds; covers a sub-millisecond rules hit up to a slow Pinecone or Jupiter call.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_enabled = METRICS_ENABLED
+_lock = threading.Lock()
+# stage -> [bucket counts..., +Inf count], sum
+_histograms: Dict[str, Tuple[list, list]] = {}
+# (name, sorted label items) -> value
+_counters: Dict[Tuple[str, tuple], float] = {}
+
+_COUNTER_HELP = {
+    "blinkbot_intent_decisions_total": "Which path decided the intent of a query.",
+    "blinkbot_cache_requests_total": "Embedding and intent cache lookups by result.",
+    "blinkbot_jupiter_requests_total": "Jupiter lite-search fallback lookups by result.",
+    "blinkbot_token_corrections_total": "Token symbols resolved by local typo correction.",
+}
+
+# name -> (help, type, fn): values read from their owner at scrape time.
+_collected: Dict[str, tuple] = {}
+
+# Stage timings of the request being handled, for the Server-Timing header.
+_trace: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("blinkbot_trace", default=None)
+_NULL = nullcontext()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(value: bool):
+    global _enabled
+    _enabled = value
+
+
+def observe(stage: str, seconds: float):
+    with _lock:
+        entry = _histograms.get(stage)
+        if entry is None:
+            entry = _histograms[stage] = ([0] * (len(BUCKETS) + 1), [0.0])
+        entry[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        entry[1][0] += seconds
+    trace = _trace.get()
+    if trace is not None:
+        trace[stage] = trace.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def _timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def stage(name: str):
+    """Time the enclosed block as pipeline stage `name`; a shared no-op when metrics are off."""
+    return _timed(name) if _enabled else _NULL
+
+
+def count(name: str, amount: float = 1, **labels):
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def register(name: str, help_text: str, fn, kind: str = "gauge"):
+    """
+    Expose a value owned elsewhere (a queue depth, a counter kept by a
+    component). `fn()` returns a number or a list of (labels dict, number).
+    """
+    _collected[name] = (help_text, kind, fn)
+
+
+@contextmanager
+def trace():
+    """Collect the stage timings of one request; yields the stage -> seconds dict."""
+    timings = {} if _enabled else None
+    token = _trace.set(timings)
+    try:
+        yield timings
+    finally:
+        _trace.reset(token)
+
+
+def server_timing(timings: Optional[dict]) -> str:
+    """Format stage timings as a Server-Timing header value (durations in milliseconds)."""
+    if not timings:
+        return ""
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())
+
+
+def _labels(items) -> str:
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    """All histograms and counters in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {k: (list(b), s[0]) for k, (b, s) in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP blinkbot_stage_seconds Time spent in each stage of query processing.",
+        "# TYPE blinkbot_stage_seconds histogram",
+    ]
+    for stage_name in sorted(histograms):
+        buckets, total = histograms[stage_name]
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), buckets):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'blinkbot_stage_seconds_bucket{{stage="{stage_name}",le="{le}"}} {cumulative}')
+        lines.append(f'blinkbot_stage_seconds_sum{{stage="{stage_name}"}} {total}')
+        lines.append(f'blinkbot_stage_seconds_count{{stage="{stage_name}"}} {cumulative}')
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {name} {_COUNTER_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for (n, items), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_labels(items)} {value:g}")
+
+    for name in sorted(_collected):
+        help_text, kind, fn = _collected[name]
+        try:
+            values = fn()
+        except Exception as e:
+            print(f"Metric {name} failed: {e}")
+            continue
+        if not isinstance(values, list):
+            values = [({}, values)]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            lines.append(f"{name}{_labels(sorted(labels.items()))} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
@@ -0,0 +1,138 @@
+import sys, os
+import time
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_DIM, EMBEDDING_ONNX_INT8_FILE, UPSERT_FILE,
+)
+
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# One SentenceTransformer per (model, backend, dimensions) for the whole
+# process. Nothing here imports torch until a model is actually needed.
+_models = {}
+_lock = threading.Lock()
+
+
+def _key(name: str, backend: str, dim: int) -> str:
+    # Same naming as EMBEDDING_MODEL_KEY in src/config.py.
+    return name if backend == "torch" and not dim else f"{name}:{backend}:{dim}"
+
+
+def _load(name: str, backend: str, dim: int):
+    from sentence_transformers import SentenceTransformer
+
+    kwargs = {"truncate_dim": dim} if dim else {}
+    if backend == "torch":
+        return SentenceTransformer(name, **kwargs)
+    if backend == "torch-int8":
+        import torch
+        model = SentenceTransformer(name, device="cpu", **kwargs)
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "onnx":
+        return SentenceTransformer(name, backend="onnx", **kwargs)
+    if backend == "onnx-int8":
+        return SentenceTransformer(name, backend="onnx", model_kwargs={"file_name": EMBEDDING_ONNX_INT8_FILE}, **kwargs)
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+def get_model(name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_BACKEND, dim: int = EMBEDDING_DIM):
+    """Return the shared model for `name` on `backend`, loading it on first use."""
+    key = _key(name, backend, dim)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            print(f"Loading embedding model {key}...")
+            model = _load(name, backend, dim)
+            _models[key] = model
+    return model
+
+
+def is_loaded(name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_BACKEND, dim: int = EMBEDDING_DIM) -> bool:
+    return _key(name, backend, dim) in _models
+
+
+def warmup(name: str = EMBEDDING_MODEL_NAME):
+    """Load the model and run one forward pass so the first request does not pay for it."""
+    get_model(name).encode("warmup")
+
+
+def report(settings, name: str = EMBEDDING_MODEL_NAME, samples: int = 200):
+    """
+    Accuracy versus latency of each (backend, dim) in `settings` on data/upsert.json.
+
+    Every example is embedded with the setting under test (as the index
+    would be) and classified by its nearest other example, so "accuracy"
+    is leave-one-out nearest-neighbour accuracy and "agree" is agreement
+    with the first setting. Latency is single-query encode time.
+    """
+    import numpy as np
+    from src.embedding_cache import normalize_query
+    from src.vector_index import load_examples, _normalize
+
+    _, labels, texts = load_examples(UPSERT_FILE)
+    texts = [normalize_query(t) for t in texts]
+    labels = np.array(labels)
+    reference = None
+
+    print(f"{len(texts)} examples, single-query latency over {min(samples, len(texts))} of them")
+    print(f"{'backend':>10} {'dim':>5} {'load s':>7} {'batch/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'accuracy':>9} {'agree':>7}")
+    for backend, dim in settings:
+        try:
+            start = time.perf_counter()
+            model = get_model(name, backend, dim)
+            model.encode("warmup")
+            load = time.perf_counter() - start
+        except Exception as e:
+            print(f"{backend:>10} {dim or '-':>5}  skipped: {e}")
+            continue
+
+        start = time.perf_counter()
+        vectors = _normalize(model.encode(texts, batch_size=64))
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        latencies = []
+        for text in texts[:samples]:
+            start = time.perf_counter()
+            model.encode(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        scores = vectors @ vectors.T
+        np.fill_diagonal(scores, -np.inf)
+        predicted = labels[np.argmax(scores, axis=1)]
+        if reference is None:
+            reference = predicted
+        print(
+            f"{backend:>10} {dim or '-':>5} {load:>7.1f} {throughput:>8.1f}"
+            f" {np.percentile(latencies, 50):>7.2f} {np.percentile(latencies, 95):>7.2f}"
+            f" {np.mean(predicted == labels):>9.1%} {np.mean(predicted == reference):>7.1%}"
+        )
+        _models.pop(_key(name, backend, dim), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends on the training examples")
+    parser.add_argument("--report", action="store_true", help="Print accuracy and latency per backend")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--dims", default="0,384,256", help="Output dimensions to try (0 = all)")
+    parser.add_argument("--samples", type=int, default=200, help="Queries timed one at a time")
+    args = parser.parse_args()
+
+    if not args.report:
+        parser.print_help()
+        return
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    dims = [int(d) for d in args.dims.split(",") if d.strip()]
+    report([(b, d) for b in backends for d in dims], samples=args.samples)
+
+
+if __name__ == "__main__":
+    main()
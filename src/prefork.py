@@ -0,0 +1,134 @@
+import sys, os
+import gc
+import time
+import signal
+import socket
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _drop_connections():
+    # Sockets and HTTP pools must not be shared between processes; each
+    # worker opens its own on first use.
+    from src import intent_recognition, jupiter
+    from src.config import VECTOR_BACKEND
+    if VECTOR_BACKEND != "local":
+        intent_recognition._index = None
+    jupiter._session = None
+
+
+def _limit_torch_threads(threads: int):
+    if threads and "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+def _run_worker(sock: socket.socket, threads: int, log_level: str):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    _limit_torch_threads(threads)
+
+    import uvicorn
+    from src.server import app
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = 2,
+          log_level: str = "info", backlog: int = 2048):
+    """
+    Load the model, token index and local vector index once, then fork
+    `workers` uvicorn processes that share them copy-on-write on one
+    listening socket. Dead workers are replaced by a fresh fork of the
+    parent, which is cheap since nothing needs to be loaded again.
+
+    torch's intra-op and OpenMP thread pools do not survive a fork, so the
+    parent only loads the weights; each worker runs the warmup encode
+    itself. Whatever the parent still has to encode (a stale local index,
+    the intent-cache prewarm) runs on one thread, which starts no pool.
+    """
+    from src import server
+
+    sock = _bind(host, port, backlog)
+    print(f"Preloading in parent process {os.getpid()}...")
+    start = time.perf_counter()
+    if not server.EMBED_WORKERS:
+        import torch
+        torch.set_num_threads(1)
+    server.preload(warm=False)
+    server._preloaded = True
+    _drop_connections()
+    # Move everything loaded so far out of the collector's reach, so
+    # collections in the workers do not write to (and un-share) those pages.
+    gc.collect()
+    gc.freeze()
+    print(f"Preloaded in {time.perf_counter() - start:.1f}s; starting {workers} workers on {host}:{port}")
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(sock, threads, log_level)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"Worker {pid} exited with status {status}, starting a new one")
+        if time.monotonic() - started < 1.0:
+            # Crashing on startup; don't spin.
+            time.sleep(1.0)
+        spawn()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve src.server:app from pre-forked workers that share the loaded model")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from src.config import (
+    PROFILING_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_INTERVAL_MS, PROFILE_DIR, PROFILE_MAX_FILES,
+)
+
+MODES = ("cprofile", "sample")
+
+# Checked here rather than per request, so a typo stops the server at
+# startup instead of turning every profiled request into a 500.
+if PROFILING_ENABLED and PROFILE_MODE not in MODES:
+    raise ValueError(f"Unknown PROFILE_MODE {PROFILE_MODE!r}; choose from {', '.join(MODES)}")
+
+# One profile at a time per process: concurrent ones would muddle each
+# other's timings, so a request that arrives meanwhile runs unprofiled.
+_busy = threading.Lock()
+
+
+def wanted(header: Optional[str] = None) -> bool:
+    """Whether to profile this request: never unless enabled, then on the header or by sampling."""
+    if not PROFILING_ENABLED:
+        return False
+    if header is not None and header.strip().lower() not in ("", "0", "false", "no"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class StackSampler:
+    """
+    Records the call stack of one thread every `interval` seconds from a
+    background thread. Work the profiled thread hands to other threads
+    (the micro-batcher, index hedging, Jupiter lookups) shows up as the
+    frame it waits in.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []
+        self.samples = []
+        self.weights = []
+        self._frame_ids = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_ids.get(key)
+        if index is None:
+            index = self._frame_ids[key] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        return index
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append((now - last) * 1000)
+            last = now
+
+    def speedscope(self, name: str) -> dict:
+        """The samples in speedscope's file format (open at https://www.speedscope.app)."""
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(self.weights),
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+            "name": name,
+            "exporter": "blinkbot",
+        }
+
+
+def _prune(directory: str, keep: int):
+    if keep <= 0:
+        return
+    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith((".pstats", ".speedscope.json"))]
+    files.sort(key=os.path.getmtime)
+    for path in files[:-keep]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def capture(mode: str = PROFILE_MODE, directory: str = PROFILE_DIR):
+    """
+    Profile the enclosed block on the current thread and write the result
+    to `directory`. Yields a dict: set "name" in it to label the file (the
+    query, say); "path" holds the file written once the block is done. If
+    another profile is already running, nothing is captured.
+    """
+    info = {}
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode {mode!r}; choose from {', '.join(MODES)}")
+    if not _busy.acquire(blocking=False):
+        yield info
+        return
+
+    try:
+        start = time.perf_counter()
+        if mode == "sample":
+            profiler = StackSampler(threading.get_ident())
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            yield info
+        finally:
+            if mode == "sample":
+                profiler.stop()
+            else:
+                profiler.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+        name = info.get("name") or "request"
+        slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")[:40] or "request"
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{elapsed_ms:.0f}ms-{slug}"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if mode == "sample":
+                path = os.path.join(directory, stem + ".speedscope.json")
+                with open(path, "w") as f:
+                    json.dump(profiler.speedscope(f"{name} ({elapsed_ms:.1f} ms)"), f)
+            else:
+                path = os.path.join(directory, stem + ".pstats")
+                profiler.dump_stats(path)
+            _prune(directory, PROFILE_MAX_FILES)
+            info["path"] = path
+        except OSError as e:
+            print(f"Failed to write profile: {e}")
+    finally:
+        _busy.release()
@@ -0,0 +1,222 @@
+import sys, os
+import json
+import time
+import argparse
+import multiprocessing
+from collections import Counter, deque
+from typing import Dict, Iterable, Iterator, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import EMBED_BATCH_SIZE
+
+
+# Fields that may hold the expected intent of a logged query.
+LABEL_FIELDS = ("expected", "expected_intent", "intent", "label")
+
+_parse = True
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """
+    Stream {"query", "expected"} records from a JSONL log ("-" for stdin).
+    Lines that are not JSON are taken as a bare query without a label.
+    """
+    f = sys.stdin if path == "-" else open(path, "r")
+    try:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("{"):
+                yield {"query": line, "expected": None}
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            query = record.get("query")
+            if not query:
+                continue
+            expected = next((record[k] for k in LABEL_FIELDS if record.get(k)), None)
+            yield {"query": query, "expected": expected}
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def chunked(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(parse: bool, use_cache: bool, threads: int):
+    global _parse
+    _parse = parse
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    from src import intent_recognition
+    if not use_cache:
+        intent_recognition.intent_cache = None
+
+
+def _classify_one(query: str):
+    from src.intent_recognition import classify_intent
+    from src.entities import parse_intent
+    try:
+        intent = classify_intent(query)
+        result = parse_intent(intent, query) if _parse and intent else None
+        return intent, result, None
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}"
+
+
+def run_chunk(chunk: List[Dict]) -> List[Dict]:
+    """Classify (and parse) one chunk with a single batched encode; runs inside a worker."""
+    from src.intent_recognition import classify_intents
+    from src.entities import parse_intents
+
+    queries = [r["query"] for r in chunk]
+    try:
+        intents = classify_intents(queries)
+        results = parse_intents(intents, queries) if _parse else [None] * len(queries)
+        errors = [None] * len(queries)
+    except Exception:
+        # One bad query should not cost the whole chunk.
+        intents, results, errors = zip(*(_classify_one(q) for q in queries))
+
+    out = []
+    for record, intent, result, error in zip(chunk, intents, results, errors):
+        row = {"query": record["query"], "expected": record["expected"], "intent": intent}
+        if _parse:
+            row["result"] = result
+        if error:
+            row["error"] = error
+        out.append(row)
+    return out
+
+
+def replay(records: Iterable[Dict], workers: int = 1, chunk_size: int = EMBED_BATCH_SIZE,
+           parse: bool = True, use_cache: bool = False) -> Iterator[Dict]:
+    """
+    Run `records` through classify_intents/parse_intents and yield one
+    result row per record, in input order. The intent cache is bypassed
+    unless `use_cache` is set, so accuracy is measured on the current model
+    rather than on cached answers.
+
+    With workers > 1 chunks are spread over a process pool; at most two
+    chunks per worker are in flight, so arbitrarily large logs stream
+    through in constant memory.
+    """
+    chunks = chunked(records, chunk_size)
+    if workers <= 1:
+        _init_worker(parse, use_cache, 0)
+        for chunk in chunks:
+            yield from run_chunk(chunk)
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    ctx = multiprocessing.get_context(method)
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(parse, use_cache, threads)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(run_chunk, (chunk,)))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+class Report:
+    """Running accuracy and confusion counts over replayed rows."""
+
+    def __init__(self):
+        self.total = 0
+        self.labelled = 0
+        self.correct = 0
+        self.errors = 0
+        self.predicted = Counter()
+        self.confusion = Counter()
+
+    def add(self, row: Dict):
+        self.total += 1
+        self.predicted[row["intent"]] += 1
+        if row.get("error"):
+            self.errors += 1
+        expected = row.get("expected")
+        if expected:
+            self.labelled += 1
+            self.confusion[(expected, row["intent"])] += 1
+            if expected == row["intent"]:
+                self.correct += 1
+
+    def print(self, elapsed: float, out=sys.stderr):
+        qps = self.total / elapsed if elapsed > 0 else 0.0
+        print(f"{self.total} queries in {elapsed:.1f}s ({qps:.1f} queries/s), {self.errors} errors", file=out)
+        if not self.labelled:
+            print("Predicted intents:", file=out)
+            for intent, n in self.predicted.most_common():
+                print(f"  {str(intent):<12} {n}", file=out)
+            return
+
+        print(f"Accuracy: {self.correct / self.labelled:.1%} over {self.labelled} labelled queries", file=out)
+        expected = sorted({e for e, _ in self.confusion})
+        labels = expected + sorted({str(p) for _, p in self.confusion} - set(expected))
+        width = max(8, max(len(str(l)) for l in labels) + 1)
+
+        print("\nPer-intent accuracy:", file=out)
+        for e in expected:
+            n = sum(c for (x, _), c in self.confusion.items() if x == e)
+            ok = self.confusion[(e, e)]
+            print(f"  {e:<{width}} {ok / n:>7.1%}  ({ok}/{n})", file=out)
+
+        print("\nConfusion matrix (rows: expected, columns: predicted):", file=out)
+        print(" " * width + "".join(f"{str(l)[:width - 1]:>{width}}" for l in labels), file=out)
+        for e in expected:
+            cells = []
+            for p in labels:
+                n = sum(c for (x, y), c in self.confusion.items() if x == e and str(y) == p)
+                cells.append(f"{n or '.':>{width}}")
+            print(f"{e:<{width}}" + "".join(cells), file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a JSONL query log through the classifier and parsers")
+    parser.add_argument("input", help='JSONL with a "query" and optionally an "expected" intent per line ("-" for stdin)')
+    parser.add_argument("-o", "--output", help="Write one JSON result per line here")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=EMBED_BATCH_SIZE, help="Queries per batched encode")
+    parser.add_argument("--no-parse", action="store_true", help="Only classify; skip entity parsing (and Jupiter)")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Answer from (and fill) the intent cache; by default replay measures the model itself")
+    args = parser.parse_args()
+
+    out: Optional[object] = open(args.output, "w") if args.output else None
+    report = Report()
+    start = time.perf_counter()
+    try:
+        rows = replay(read_records(args.input), workers=args.workers, chunk_size=args.chunk_size,
+                      parse=not args.no_parse, use_cache=args.use_cache)
+        for row in rows:
+            report.add(row)
+            if out:
+                out.write(json.dumps(row) + "\n")
+    finally:
+        if out:
+            out.close()
+    report.print(time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.admission import Overloaded
+from src.config import (
+    INDEX_DEADLINE_MS, INDEX_HEDGE_QUANTILE, INDEX_HEDGE_MIN_MS,
+    INDEX_BREAKER_FAILURES, INDEX_BREAKER_RESET_SECONDS,
+)
+
+
+class IndexUnavailable(Overloaded):
+    """The vector index failed, timed out or is behind an open breaker; handled like Overloaded."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures and refuses calls for
+    `reset_after` seconds. Then a single trial call is let through
+    (half-open): success closes the breaker, failure opens it again.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failures: int = INDEX_BREAKER_FAILURES, reset_after: float = INDEX_BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.opened = 0
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_after:
+                    return False
+                self.state, self._trial = self.HALF_OPEN, False
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    return False
+                self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state, self._consecutive, self._trial = self.CLOSED, 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == self.HALF_OPEN or self._consecutive >= self.failures:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state, self._opened_at, self._trial = self.OPEN, time.monotonic(), False
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 1.0
+        return max(1.0, self.reset_after - (time.monotonic() - self._opened_at))
+
+
+class ResilientIndex:
+    """
+    Wraps a remote index so `query` has a deadline, a hedged second request
+    and a circuit breaker.
+
+    The first request gets `deadline` seconds in total. If it has not
+    answered after the `hedge_quantile` of recent latencies (or fails
+    outright), one more identical request is sent and whichever succeeds
+    first wins. Each request passes what is left of the deadline to the
+    client as its `timeout`, so an abandoned request does not hold its
+    thread for longer than that. When all `workers` threads are still busy
+    (the index hangs), a query fails at once instead of queueing behind
+    them. Failures and missed deadlines raise IndexUnavailable and count
+    towards the breaker. Everything else (upsert, delete, ...) goes
+    straight to the wrapped index.
+    """
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, index, deadline: float = INDEX_DEADLINE_MS / 1000,
+                 hedge_quantile: float = INDEX_HEDGE_QUANTILE, hedge_min: float = INDEX_HEDGE_MIN_MS / 1000,
+                 breaker: CircuitBreaker = None, workers: int = 16):
+        self._index = index
+        self.deadline = deadline
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min = hedge_min
+        self.breaker = breaker or CircuitBreaker()
+        self.workers = workers
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=256)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-query")
+        self._stats = {
+            "queries": 0, "hedges": 0, "hedge_wins": 0, "retries": 0,
+            "errors": 0, "deadline_exceeded": 0, "short_circuited": 0, "saturated": 0,
+        }
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _hedge_delay(self) -> float:
+        with self._lock:
+            ordered = sorted(self._latencies)
+        if len(ordered) < self.MIN_SAMPLES:
+            return self.deadline / 2
+        quantile = ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_quantile))]
+        return max(self.hedge_min, quantile)
+
+    def _call(self, args, kwargs):
+        try:
+            return self._index.query(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._busy -= 1
+
+    def _submit(self, args, kwargs, deadline: float):
+        """Start one request with the rest of the deadline as its timeout; None if no thread is free."""
+        with self._lock:
+            if self._busy >= self.workers:
+                return None
+            self._busy += 1
+        kwargs = dict(kwargs)
+        kwargs.setdefault("timeout", max(0.001, deadline - time.monotonic()))
+        return self._pool.submit(self._call, args, kwargs)
+
+    def query(self, *args, **kwargs):
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise IndexUnavailable("vector index circuit open", self.breaker.retry_after())
+
+        self._count("queries")
+        start = time.monotonic()
+        deadline = start + self.deadline
+        hedge_at = start + self._hedge_delay()
+        first = self._submit(args, kwargs, deadline)
+        if first is None:
+            # Every thread is stuck on earlier requests; waiting would only miss the deadline.
+            self._count("saturated")
+            self.breaker.record_failure()
+            raise IndexUnavailable(f"vector index: all {self.workers} query threads busy", self.breaker.retry_after())
+
+        pending = {first}
+        second = None
+        sent_second = False
+        error = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            until = hedge_at if not sent_second and hedge_at < deadline else deadline
+            done, pending = wait(pending, timeout=max(0.0, until - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    with self._lock:
+                        self._latencies.append(time.monotonic() - start)
+                    self.breaker.record_success()
+                    if future is second:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+
+            if not sent_second and (not pending or time.monotonic() >= hedge_at):
+                # A slow first request gets a hedge; a failed one gets one retry.
+                sent_second = True
+                second = self._submit(args, kwargs, deadline)
+                if second is None:
+                    self._count("saturated")
+                else:
+                    self._count("retries" if not pending else "hedges")
+                    pending = set(pending) | {second}
+
+        self.breaker.record_failure()
+        if pending:
+            self._count("deadline_exceeded")
+            raise IndexUnavailable(f"vector index query exceeded {self.deadline * 1000:.0f} ms", self.breaker.retry_after())
+        self._count("errors")
+        raise IndexUnavailable(f"vector index query failed: {error}", self.breaker.retry_after()) from error
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, busy=self._busy)
+        return dict(
+            stats,
+            breaker=self.breaker.state,
+            breaker_opened=self.breaker.opened,
+            hedge_delay_ms=round(self._hedge_delay() * 1000, 1),
+        )
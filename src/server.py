@@ -1,24 +1,217 @@
-from fastapi import FastAPI, Query
+import math
+import os
+from contextlib import nullcontext
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from src.intent_recognition import classify_intent
-from src.entities import parse_intent
+from src.intent_recognition import classify_intent, classify_intents, get_index
+from src.entities import parse_intent, parse_intents, get_token_matcher
+from src.models import get_model, warmup
+from src.config import (
+    EMBEDDING_BATCHING, MAX_BATCH_QUERIES, INTENT_CACHE_PREWARM_FILE, VECTOR_BACKEND,
+    MAX_CONCURRENT_REQUESTS, RETRY_AFTER_SECONDS, EMBED_WORKERS,
+)
+from src import intent_recognition, cascade
+from src.intent_cache import prewarm
+from src.batching import ActivityCounter
+from src.admission import Gate, Overloaded
+from src.resilience import CircuitBreaker, ResilientIndex
+from src import metrics, profiling
+from src.embeddings import enable_batching, disable_batching, enable_pool, disable_pool, pool_stats
 
 app = FastAPI(title="Blink Bot API")
+in_flight = ActivityCounter()
+request_gate = Gate("requests", MAX_CONCURRENT_REQUESTS, retry_after=RETRY_AFTER_SECONDS)
+
+
+def _gate_metric(field: str):
+    return lambda: [({"gate": g.name}, g.stats()[field]) for g in (request_gate, intent_recognition.embed_gate)]
+
+
+metrics.register("blinkbot_admission_active", "Requests holding an admission slot.", _gate_metric("active"))
+metrics.register("blinkbot_admission_queue_depth", "Requests waiting for a slot.", _gate_metric("waiting"))
+metrics.register("blinkbot_admission_rejected_total", "Requests turned away with a full queue.",
+                 _gate_metric("rejected"), "counter")
+metrics.register("blinkbot_admission_timeouts_total", "Requests that gave up waiting for a slot.",
+                 _gate_metric("timed_out"), "counter")
+
+
+def _index_stats() -> dict:
+    index = intent_recognition._index
+    return index.stats() if isinstance(index, ResilientIndex) else {}
+
+
+def _breaker_metric():
+    state = _index_stats().get("breaker")
+    if state is None:
+        return []
+    states = (CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN)
+    return [({"state": s}, int(s == state)) for s in states]
+
+
+metrics.register("blinkbot_index_breaker_state", "Vector index circuit breaker state (1 = current).", _breaker_metric)
+metrics.register(
+    "blinkbot_index_queries_total", "Vector index queries, hedges, retries and failures.",
+    lambda: [({"event": k}, v) for k, v in _index_stats().items()
+             if k in ("queries", "hedges", "hedge_wins", "retries", "errors", "deadline_exceeded", "short_circuited", "saturated")],
+    "counter",
+)
+
+metrics.register("blinkbot_embedding_workers_idle", "Embedding worker processes waiting for work.",
+                 lambda: pool_stats().get("idle", 0))
+metrics.register("blinkbot_embedding_worker_restarts_total", "Embedding worker processes replaced after dying.",
+                 lambda: pool_stats().get("restarts", 0), "counter")
+
+# `ready` is True between a finished startup and the start of shutdown;
+# `_preloaded` is set when src/prefork.py already did preload() before forking.
+ready = False
+_preloaded = False
+
+
+def preload(warm: bool = True):
+    """
+    Load everything a worker can share: model, local index, tokens, first-stage classifier.
+    With `warm=False` the model weights are loaded but no warmup encode is run.
+    """
+    # With embedding worker processes the model lives there instead.
+    if not EMBED_WORKERS:
+        warmup() if warm else get_model()
+    if VECTOR_BACKEND == "local":
+        get_index()
+    get_token_matcher()
+    # Also without CASCADE_ENABLED: degraded answers (overload, index down)
+    # come from it, and should not pay for fitting it in every worker.
+    cascade.get_classifier()
+    if INTENT_CACHE_PREWARM_FILE and intent_recognition.intent_cache is not None:
+        count = prewarm(intent_recognition.intent_cache, INTENT_CACHE_PREWARM_FILE, classify_intents)
+        print(f"Prewarmed intent cache with {count} templates")
+
+
+@app.on_event("startup")
+def startup():
+    global ready
+    # Pay for model loading and the index connection before taking traffic.
+    if not _preloaded:
+        preload()
+    elif not EMBED_WORKERS:
+        # Forked by src/prefork.py, which loaded the weights but left the
+        # first forward pass (and torch's thread pools) to each worker.
+        warmup()
+    if EMBED_WORKERS:
+        enable_pool()
+    get_index()
+    if EMBEDDING_BATCHING:
+        enable_batching(active=lambda: in_flight.value)
+    ready = True
+
+
+@app.on_event("shutdown")
+def shutdown():
+    global ready
+    ready = False
+    disable_batching()
+    disable_pool()
+
 
 class QueryRequest(BaseModel):
     query: str
 
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+
+def _overloaded(status: int, e: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        {"detail": f"Server busy ({e.reason}), retry later"},
+        status_code=status,
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
+
+
+@app.middleware("http")
+async def admission(request: Request, call_next):
+    # Runs on the event loop, so excess requests are refused before they
+    # take a worker thread.
+    if not request.url.path.startswith("/process"):
+        return await call_next(request)
+    try:
+        request_gate.acquire()
+    except Overloaded as e:
+        return _overloaded(429, e)
+    try:
+        return await call_next(request)
+    finally:
+        request_gate.release()
+
+
 @app.get("/")
 def root():
     return {"message": "Blink Bot API is running "}
 
+
+@app.get("/live")
+def live():
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+def readiness():
+    if not ready:
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"status": "ready"}
+
+@app.get("/metrics")
+def get_metrics():
+    if not metrics.enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/process")
-def process_query(request: QueryRequest):
+def process_query(request: QueryRequest, response: Response, x_profile: Optional[str] = Header(None)):
     query = request.query
-    intent = classify_intent(query)
-    result = parse_intent(intent, query) if intent else {"error": "Could not classify intent"}
-    return {
+    degraded = False
+    profile = profiling.capture() if profiling.wanted(x_profile) else nullcontext({})
+    with in_flight, metrics.trace() as timings, profile as captured:
+        captured["name"] = query
+        try:
+            intent = classify_intent(query)
+        except Overloaded as e:
+            if not e.fallback:
+                return _overloaded(503, e)
+            intent, degraded = e.fallback, True
+        result = parse_intent(intent, query) if intent else {"error": "Could not classify intent"}
+    if timings:
+        response.headers["Server-Timing"] = metrics.server_timing(timings)
+    if captured.get("path"):
+        response.headers["X-Profile-File"] = os.path.basename(captured["path"])
+    body = {
         "query": query,
         "intent": intent,
         "result": result
     }
+    if degraded:
+        body["degraded"] = True
+    return body
+
+
+@app.post("/process/batch")
+def process_batch(request: BatchQueryRequest, response: Response):
+    queries = request.queries
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    with metrics.trace() as timings:
+        try:
+            intents = classify_intents(queries)
+        except Overloaded as e:
+            return _overloaded(503, e)
+        results = parse_intents(intents, queries)
+    if timings:
+        response.headers["Server-Timing"] = metrics.server_timing(timings)
+    return {
+        "results": [
+            {"query": q, "intent": intent, "result": result}
+            for q, intent, result in zip(queries, intents, results)
+        ]
+    }
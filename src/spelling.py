@@ -0,0 +1,101 @@
+from typing import Dict, Iterable, NamedTuple, Optional
+
+
+class Correction(NamedTuple):
+    symbol: str
+    distance: int
+    confidence: float
+
+
+def max_distance_for(word: str) -> int:
+    """Edits allowed for a word of this length: none under 4 characters, 1 up to 6, then 2."""
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) <= 6 else 2
+
+
+def _deletes(word: str, depth: int) -> set:
+    out = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Optimal string alignment distance: insertions, deletions, substitutions and adjacent swaps."""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SpellIndex:
+    """
+    SymSpell-style deletion dictionary over token symbols and synonyms.
+
+    Every term is stored under all strings reachable by deleting up to
+    `max_distance` characters. A lookup generates the same deletions of the
+    query word, so finding every term within that distance costs a few
+    dict probes plus an exact distance check per candidate, instead of a
+    scan over the vocabulary.
+    """
+
+    def __init__(self, terms: Iterable[str] = (), synonyms: Dict[str, str] = None, max_distance: int = 2):
+        self.max_distance = max_distance
+        self._terms: Dict[str, str] = {}
+        self._deletes: Dict[str, list] = {}
+        for term in terms:
+            self.add(term)
+        for term, symbol in (synonyms or {}).items():
+            self.add(term, symbol)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def add(self, term: str, symbol: str = None):
+        term = term.upper()
+        # Multi-word synonyms are the trie's job; only single words are corrected.
+        if not term or " " in term or term in self._terms:
+            return
+        self._terms[term] = (symbol or term).upper()
+        for d in _deletes(term, min(self.max_distance, max_distance_for(term))):
+            self._deletes.setdefault(d, []).append(term)
+
+    def lookup(self, word: str) -> Optional[Correction]:
+        """
+        The closest term within the distance allowed for `word`, or None.
+
+        Confidence is 1 - distance / length of the shorter of the two
+        words (one edit to a three-letter symbol is a lot), split between
+        candidates that are equally close but mean different symbols.
+        """
+        word = word.upper()
+        limit = min(self.max_distance, max_distance_for(word))
+        if limit == 0:
+            return None
+
+        best, best_terms = limit + 1, {}
+        for d in _deletes(word, limit):
+            for term in self._deletes.get(d, ()):
+                if abs(len(term) - len(word)) > limit:
+                    continue
+                distance = edit_distance(word, term)
+                if distance < best:
+                    best, best_terms = distance, {self._terms[term]: term}
+                elif distance == best:
+                    best_terms.setdefault(self._terms[term], term)
+
+        if best > limit or not best_terms:
+            return None
+        symbol = min(best_terms)
+        shortest = min(len(word), len(best_terms[symbol]))
+        confidence = (1.0 - best / shortest) / len(best_terms)
+        return Correction(symbol, best, round(confidence, 3))
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+
+# src modules open their SQLite caches at import time; keep those out of data/.
+SCRATCH_DIR = tempfile.mkdtemp(prefix="blinkbot-tests-")
+os.environ["EMBEDDING_CACHE_FILE"] = os.path.join(SCRATCH_DIR, "embedding_cache.sqlite3")
+os.environ["INTENT_CACHE_FILE"] = os.path.join(SCRATCH_DIR, "intent_cache.sqlite3")
+
+from src.loadtest import HashingEncoder
+
+# Committed reference numbers; each run's own numbers go to the (ignored) results file.
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "benchmark_baselines.json")
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), "benchmark_results.json")
+CORPUS_SIZE = int(os.getenv("BENCH_CORPUS_SIZE", "5000"))
+TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.5"))
+# Absolute slack on top of the tolerance, so sub-millisecond stages do not fail on timer noise.
+SLACK_MS = float(os.getenv("BENCH_SLACK_MS", "0.1"))
+UPDATE_BASELINE = os.getenv("BENCH_UPDATE_BASELINE") == "1"
+REAL_MODEL = os.getenv("BENCH_REAL_MODEL") == "1"
+# Benchmarks assert machine-specific timings, so they only run when asked for.
+RUN_BENCHMARKS = os.getenv("BENCH") == "1"
+
+WALLETS = [
+    "9jHi87Fe7YTYpLjVK5hxt3FZNYG6kSEUew4h2zqdcJYZ",
+    "DJrbKje9udU4M3WfGhKKziS6E7rNYGb5DkEdJNCMZV1K",
+    "3aBBjvYi2E9t3xjEwS9FTasW9K6fP8dDfJpZ4pZm1K9P",
+]
+TOKENS = ["sol", "usdc", "usdt", "bonk", "jup", "eth", "btc", "wif", "ray", "bitcoin", "ethereum", "usd coin"]
+TEMPLATES = {
+    "swap": ["swap {amount} {a} to {b}", "can you please swap {a} to {b}", "swap {a} for {b}"],
+    "buy": ["buy {a}", "i want to buy some {a}", "buy {name}.sol"],
+    "price": ["price of {a}", "what is the price of {a}?", "how much is {a} worth"],
+    "balance": ["check balance of {a} in wallet {wallet}", "{a} balance for {wallet}"],
+    "transfer": ["send {amount} {a} to {wallet}", "transfer {amount} {a} to {wallet}"],
+    "donation": ["donate to {wallet}", "create a donation blink for {wallet}"],
+    "stake": ["stake {a}", "lock my bonk for 12 months"],
+    "game": ["create a blink for a coin flip game", "play rock paper scissors", "snake and ladders blink"],
+    "domain": ["domain {name}.sol", "is {name}.sol available"],
+    "static": ["open keystone wallet", "deposit funds on lulo"],
+}
+
+
+class StubResponse:
+    status_code = 200
+
+    def json(self):
+        return []
+
+
+class StubSession:
+    """Jupiter lite-search stand-in: knows no extra tokens, answers instantly."""
+
+    calls = 0
+
+    def get(self, url, timeout=None):
+        StubSession.calls += 1
+        return StubResponse()
+
+
+def generate_corpus(size: int = CORPUS_SIZE, seed: int = 0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        intent = rng.choice(list(TEMPLATES))
+        a, b = rng.sample(TOKENS, 2)
+        query = rng.choice(TEMPLATES[intent]).format(
+            amount=rng.choice(["1", "10", "2.5", "100"]), a=a, b=b,
+            wallet=rng.choice(WALLETS), name=rng.choice(["abhi", "degen", "wallet", "xyz"]),
+        )
+        corpus.append((intent, query))
+    return corpus
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    return generate_corpus()
+
+
+@pytest.fixture(scope="session")
+def bench_env(tmp_path_factory):
+    """
+    The real pipeline with its external dependencies replaced: a local
+    vector index instead of Pinecone, a stub Jupiter session, no on-disk
+    caches, and (unless BENCH_REAL_MODEL=1) a hashed fake model.
+    """
+    pytest.importorskip("numpy")
+    pytest.importorskip("dotenv")
+    pytest.importorskip("requests")
+
+    from src import models, embeddings, intent_recognition, entities, jupiter
+    from src.config import EMBEDDING_MODEL_KEY, UPSERT_FILE
+    from src.embedding_cache import EmbeddingCache
+    from src.vector_index import LocalIndex
+
+    with pytest.MonkeyPatch.context() as mp:
+        if REAL_MODEL:
+            pytest.importorskip("sentence_transformers")
+        else:
+            mp.setitem(models._models, EMBEDDING_MODEL_KEY, HashingEncoder())
+
+        mp.setattr(embeddings, "cache", EmbeddingCache(max_size=0))
+        mp.setattr(intent_recognition, "intent_cache", None)
+        mp.setattr(intent_recognition, "_index", LocalIndex.build(UPSERT_FILE, lambda texts: models.get_model().encode(texts)))
+        mp.setattr(jupiter, "_session", StubSession())
+        mp.setattr(entities, "append_discovery", lambda symbol: None)
+        entities.load_cached_tokens()
+        yield intent_recognition
+
+
+def _load_baselines():
+    try:
+        with open(BASELINE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class BenchmarkRecorder:
+    def __init__(self):
+        self.baselines = _load_baselines()
+        self.results = {}
+
+    def check(self, name: str, report: dict):
+        # Real-model numbers are not comparable with the fake model's.
+        if REAL_MODEL:
+            name += "[real-model]"
+        self.results[name] = report
+        print(f"\n{name}: " + ", ".join(f"{k}={v}" for k, v in report.items()))
+        if UPDATE_BASELINE:
+            return
+        baseline = self.baselines.get(name)
+        if baseline is None:
+            pytest.fail(f"No baseline for {name} in {BASELINE_FILE}; record one with BENCH_UPDATE_BASELINE=1")
+        limit = baseline["p95_ms"] * (1 + TOLERANCE) + SLACK_MS
+        assert report["p95_ms"] <= limit, (
+            f"{name} regressed: p95 {report['p95_ms']} ms > {limit:.3f} ms "
+            f"(baseline {baseline['p95_ms']} ms + {TOLERANCE:.0%} + {SLACK_MS} ms)"
+        )
+
+    def save(self):
+        if not self.results:
+            return
+        with open(RESULTS_FILE, "w") as f:
+            json.dump(self.results, f, indent=2, sort_keys=True)
+        if UPDATE_BASELINE:
+            merged = dict(self.baselines, **self.results)
+            with open(BASELINE_FILE, "w") as f:
+                json.dump(merged, f, indent=2, sort_keys=True)
+
+
+@pytest.fixture(scope="session")
+def bench():
+    recorder = BenchmarkRecorder()
+    yield recorder
+    recorder.save()
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: latency benchmark, only run with BENCH=1")
+
+
+def pytest_collection_modifyitems(config, items):
+    if RUN_BENCHMARKS:
+        return
+    skip = pytest.mark.skip(reason="latency benchmark; set BENCH=1 to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from src.admission import Gate, Overloaded
+
+
+def test_full_gate_with_no_queue_rejects_at_once():
+    gate = Gate("test", limit=1, retry_after=2.0)
+    with gate.slot():
+        with pytest.raises(Overloaded) as info:
+            gate.acquire()
+    assert info.value.retry_after == 2.0
+    assert "queue full" in info.value.reason
+    assert gate.stats() == {"limit": 1, "active": 0, "waiting": 0, "admitted": 1, "rejected": 1, "timed_out": 0}
+
+
+def test_waiter_times_out():
+    gate = Gate("test", limit=1, max_queue=1, timeout=0.05)
+    gate.acquire()
+    start = time.monotonic()
+    with pytest.raises(Overloaded, match="no slot within 50 ms"):
+        gate.acquire()
+    assert time.monotonic() - start >= 0.05
+    assert (gate.timed_out, gate.waiting) == (1, 0)
+
+
+def test_waiter_gets_the_released_slot():
+    gate = Gate("test", limit=1, max_queue=1, timeout=2.0)
+    gate.acquire()
+    admitted = threading.Event()
+
+    def wait_for_slot():
+        with gate.slot():
+            admitted.set()
+
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    while gate.waiting == 0:
+        time.sleep(0.001)
+    assert not admitted.is_set()
+    gate.release()
+    waiter.join(2)
+    assert admitted.is_set()
+    assert (gate.admitted, gate.active) == (2, 0)
+
+
+def test_limit_zero_disables_the_gate():
+    gate = Gate("test", limit=0)
+    for _ in range(100):
+        gate.acquire()
+    assert gate.stats()["admitted"] == 0
+
+
+def test_a_failing_holder_still_releases_its_slot():
+    gate = Gate("test", limit=1)
+    with pytest.raises(RuntimeError):
+        with gate.slot():
+            raise RuntimeError("handler failed")
+    with gate.slot():
+        pass
+    assert (gate.active, gate.admitted, gate.rejected) == (0, 2, 0)
+
+
+def test_server_sheds_excess_requests_with_retry_after(monkeypatch):
+    testclient = pytest.importorskip("fastapi.testclient")
+    from src import server
+
+    monkeypatch.setattr(server, "request_gate", Gate("requests", limit=1, retry_after=1.5))
+    server.request_gate.acquire()
+    try:
+        response = testclient.TestClient(server.app).post("/process", json={"query": "price of sol"})
+    finally:
+        server.request_gate.release()
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert "queue full" in response.json()["detail"]
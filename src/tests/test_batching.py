@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.batching import ActivityCounter, EmbeddingBatcher
+
+
+def _recording_encoder(sizes):
+    def encode(texts):
+        sizes.append(len(texts))
+        return np.arange(len(texts), dtype=np.float32)[:, None]
+    return encode
+
+
+def _encode_two(batcher):
+    first = batcher.submit("a")
+    time.sleep(0.02)
+    second = batcher.submit("b")
+    first.result(1), second.result(1)
+
+
+def test_active_hint_flushes_once_every_request_joined():
+    sizes = []
+    batcher = EmbeddingBatcher(_recording_encoder(sizes), max_wait_ms=200, active=lambda: 1).start()
+    try:
+        _encode_two(batcher)
+    finally:
+        batcher.stop()
+    assert sizes == [1, 1]
+
+
+def test_untracked_callers_wait_out_the_window():
+    # active() == 0: nobody is counted (replay, direct encode_query), so batching stays on.
+    sizes = []
+    batcher = EmbeddingBatcher(_recording_encoder(sizes), max_wait_ms=200, active=lambda: 0).start()
+    try:
+        _encode_two(batcher)
+    finally:
+        batcher.stop()
+    assert sizes == [2]
+
+
+def test_lone_request_is_not_delayed():
+    sizes = []
+    in_flight = ActivityCounter()
+    batcher = EmbeddingBatcher(_recording_encoder(sizes), max_wait_ms=500,
+                               active=lambda: in_flight.value).start()
+    try:
+        with in_flight:
+            start = time.monotonic()
+            batcher.encode("a", timeout=1)
+            elapsed = time.monotonic() - start
+    finally:
+        batcher.stop()
+    assert sizes == [1]
+    assert elapsed < 0.25
+
+
+def test_concurrent_requests_share_one_batch():
+    sizes = []
+    in_flight = ActivityCounter()
+    batcher = EmbeddingBatcher(_recording_encoder(sizes), max_wait_ms=500,
+                               active=lambda: in_flight.value).start()
+    entered = threading.Barrier(3)
+
+    def request(text):
+        with in_flight:
+            entered.wait(1)
+            batcher.encode(text, timeout=2)
+
+    threads = [threading.Thread(target=request, args=(t,)) for t in "abc"]
+    try:
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(2)
+        elapsed = time.monotonic() - start
+    finally:
+        batcher.stop()
+    # All three were in flight, so the batch goes out as soon as the last one joins.
+    assert sizes == [3]
+    assert elapsed < 0.25
+
+
+def test_stop_fails_texts_still_queued():
+    started, release = threading.Event(), threading.Event()
+
+    def slow(texts):
+        started.set()
+        release.wait(2)
+        return np.zeros((len(texts), 1), dtype=np.float32)
+
+    batcher = EmbeddingBatcher(slow, max_batch_size=1, max_wait_ms=0).start()
+    first = batcher.submit("a")
+    started.wait(1)
+    queued = batcher.submit("b")
+    batcher.stop(timeout=0.05)
+    with pytest.raises(RuntimeError, match="stopped"):
+        queued.result(1)
+    release.set()
+    assert first.result(1).shape == (1,)
+    with pytest.raises(RuntimeError, match="not running"):
+        batcher.encode("c", timeout=1)
@@ -0,0 +1,106 @@
+"""
+Latency benchmarks for the classify/parse hot paths.
+
+Skipped by default; run with `BENCH=1 pytest src/tests/test_benchmarks.py -s`.
+The numbers are only meaningful on the machine that recorded the
+baselines, so re-record them (see below) before comparing elsewhere. Each stage's p95 is
+compared with the committed benchmark_baselines.json and fails when it
+exceeds the baseline by more than BENCH_TOLERANCE (plus BENCH_SLACK_MS).
+Every run writes its numbers to benchmark_results.json;
+BENCH_UPDATE_BASELINE=1 rewrites the baselines instead of checking them.
+"""
+import gc
+import time
+import resource
+
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+
+def measure(fn, items, warmup: int = 20):
+    for item in items[:warmup]:
+        fn(item)
+    gc.collect()
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed)
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 4)
+
+    return {
+        "n": len(ordered),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "qps": round(len(ordered) / elapsed, 1) if elapsed else None,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def test_rules(bench_env, corpus, bench):
+    queries = [q for _, q in corpus]
+    bench.check("rules", measure(bench_env.match_rules, queries))
+
+
+def test_embedding(bench_env, corpus, bench):
+    from src.embeddings import encode_query
+
+    queries = [q for _, q in corpus]
+    bench.check("embedding", measure(encode_query, queries))
+
+
+def test_vector_lookup(bench_env, corpus, bench):
+    from src.embeddings import generate_embeddings
+
+    index = bench_env.get_index()
+    vectors = list(generate_embeddings([q for _, q in corpus[:1000]]))
+    bench.check("vector_lookup", measure(lambda v: index.query(vector=v, top_k=1), vectors))
+
+
+def test_classify_intent(bench_env, corpus, bench):
+    queries = [q for _, q in corpus]
+    bench.check("classify_intent", measure(bench_env.classify_intent, queries))
+
+
+def test_classify_intents_batch(bench_env, corpus, bench):
+    queries = [q for _, q in corpus]
+    batches = [queries[i:i + 64] for i in range(0, len(queries), 64)]
+    report = measure(bench_env.classify_intents, batches, warmup=2)
+    report["qps"] = round(report["qps"] * 64, 1) if report["qps"] else None
+    bench.check("classify_intents_batch64", report)
+
+
+@pytest.mark.parametrize("intent", ["swap", "balance", "price", "domain", "transfer", "buy", "stake", "donation", "game"])
+def test_parse_intent(bench_env, corpus, bench, intent):
+    from src import entities
+
+    parser = getattr(entities, f"parse_{intent}_intent")
+    queries = [q for i, q in corpus if i == intent] or [q for _, q in corpus[:200]]
+    bench.check(f"parse_{intent}_intent", measure(parser, queries))
+
+
+def test_process_endpoint(bench_env, corpus, bench):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from src.server import app
+
+    queries = [q for _, q in corpus[:1000]]
+    with TestClient(app) as client:
+        def call(query):
+            response = client.post("/process", json={"query": query})
+            assert response.status_code == 200
+
+        bench.check("process_endpoint", measure(call, queries))
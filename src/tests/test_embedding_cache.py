@@ -0,0 +1,60 @@
+import os
+import sqlite3
+
+import numpy as np
+
+from src.embedding_cache import EmbeddingCache
+
+
+def _rows(path):
+    with sqlite3.connect(path) as db:
+        return [key.split("\x00")[1] for key, in db.execute("SELECT key FROM embeddings ORDER BY rowid")]
+
+
+def test_puts_reach_the_file_on_flush(tmp_path):
+    path = os.path.join(tmp_path, "embeddings.sqlite3")
+    cache = EmbeddingCache(max_size=0, path=path)
+    cache.put("Swap SOL", "m", [1.0, 2.0])
+    # Evicted from the LRU at once, but still answered before the flush.
+    np.testing.assert_array_equal(cache.get("swap sol", "m"), [1.0, 2.0])
+    assert EmbeddingCache(path=path).get("swap sol", "m") is None
+
+    cache.flush()
+    assert _rows(path) == ["swap sol"]
+    np.testing.assert_array_equal(EmbeddingCache(path=path).get("swap sol", "m"), [1.0, 2.0])
+
+
+def test_file_keeps_the_most_recent_rows(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "embeddings.sqlite3")
+    monkeypatch.setattr(EmbeddingCache, "PRUNE_EVERY", 1)
+    cache = EmbeddingCache(path=path, max_disk_rows=2)
+    for text in ("a", "b", "c"):
+        cache.put(text, "m", [0.0])
+        cache.flush()
+    assert _rows(path) == ["b", "c"]
+
+
+def test_uncounted_lookups_leave_the_stats_alone():
+    cache = EmbeddingCache()
+    cache.get("training example", "m", count=False)
+    cache.get("user query", "m")
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 1)
+
+
+def test_training_examples_bypass_the_query_cache(monkeypatch):
+    from src import embeddings
+
+    encoded = []
+
+    def encode(texts, batch_size=None):
+        encoded.append(list(texts))
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+    cache = EmbeddingCache()
+    monkeypatch.setattr(embeddings, "cache", cache)
+    monkeypatch.setattr(embeddings, "_encode_batch", encode)
+    vectors = embeddings.encode_examples(["Swap  SOL", "buy bonk", "price of jup"], batch_size=2)
+    assert vectors.shape == (3, 2)
+    assert encoded == [["swap sol", "buy bonk"], ["price of jup"]]
+    assert cache.get("swap sol", embeddings.EMBEDDING_MODEL_KEY) is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,84 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from src.embedding_pool import EmbeddingPool, EmbeddingWorkerError
+
+
+class LengthModel:
+    """Row i is [len(text), number of vowels]; encoding "die" kills the process."""
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        rows = []
+        for text in [texts] if single else texts:
+            if text == "die":
+                os._exit(1)
+            rows.append([len(text), sum(c in "aeiou" for c in text)])
+        rows = np.array(rows, dtype=np.float32)
+        return rows[0] if single else rows
+
+
+def expected(texts):
+    return LengthModel().encode(list(texts))
+
+
+def wait_for_idle(pool, n, timeout=30):
+    deadline = time.monotonic() + timeout
+    while pool.stats()["idle"] < n and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = EmbeddingPool(2, capacity=4, factory=LengthModel, start_timeout=60).start()
+    yield pool
+    pool.close()
+
+
+def test_round_trip_through_shared_memory(pool):
+    texts = ["swap sol", "price of bonk", "hi"]
+    np.testing.assert_array_equal(pool.encode(texts), expected(texts))
+
+
+def test_batches_above_capacity_are_chunked_in_order(pool):
+    texts = [f"{'a' * i}{'x' * (10 - i)}" for i in range(10)]
+    np.testing.assert_array_equal(pool.encode(texts), expected(texts))
+
+
+def test_dead_worker_is_replaced():
+    pool = EmbeddingPool(1, capacity=4, factory=LengthModel, start_timeout=60).start()
+    try:
+        with pytest.raises(EmbeddingWorkerError):
+            pool.encode(["die"])
+        wait_for_idle(pool, 1)
+        np.testing.assert_array_equal(pool.encode(["alive"]), expected(["alive"]))
+        assert pool.stats()["restarts"] == 1
+    finally:
+        pool.close()
+
+
+class Interrupted(BaseException):
+    """Stands in for KeyboardInterrupt or a cancelled thread between send and recv."""
+
+
+def test_interrupted_worker_is_not_reused():
+    pool = EmbeddingPool(1, capacity=4, factory=LengthModel, start_timeout=60).start()
+    try:
+        worker = pool._workers[0]
+
+        def interrupted(texts):
+            worker.conn.send(texts)
+            raise Interrupted
+
+        worker.encode = interrupted
+        with pytest.raises(Interrupted):
+            pool.encode(["a much longer text"])
+        wait_for_idle(pool, 1)
+        # A reused worker would hand back the unread reply for the text above.
+        np.testing.assert_array_equal(pool.encode(["ab"]), expected(["ab"]))
+        assert pool._workers[0] is not worker
+    finally:
+        pool.close()
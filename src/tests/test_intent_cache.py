@@ -0,0 +1,21 @@
+import os
+
+from src.intent_cache import IntentCache, canonicalize
+
+
+def test_amounts_addresses_and_domains_become_placeholders():
+    address = "7xKXtg2CW87d97TXJSDpbD5jBkheTqA83TZRuJosgAsU"
+    assert canonicalize(f"Send 1.5 SOL to {address}") == "send <num> sol to <addr>"
+    assert canonicalize("send 2 sol to  Toly.sol") == "send <num> sol to <domain>"
+
+
+def test_writes_are_visible_before_and_after_the_flush(tmp_path):
+    path = os.path.join(tmp_path, "intents.sqlite3")
+    cache = IntentCache(path)
+    cache.put("swap 1 sol to bonk", "swap")
+    assert cache.get("swap 20 sol to bonk") == "swap"
+    assert IntentCache(path).get("swap 1 sol to bonk") is None
+
+    cache.flush()
+    assert cache._pending == {}
+    assert IntentCache(path).get("swap 3 sol to bonk") == "swap"
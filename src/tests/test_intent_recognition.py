@@ -0,0 +1,25 @@
+import pytest
+
+from src import intent_recognition
+
+
+class StatsIndex:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def describe_index_stats(self):
+        if isinstance(self.stats, Exception):
+            raise self.stats
+        return self.stats
+
+
+def test_truncated_vectors_are_refused_for_a_wider_index(monkeypatch):
+    monkeypatch.setattr(intent_recognition, "EMBEDDING_DIM", 256)
+    with pytest.raises(ValueError, match="dimension 768"):
+        intent_recognition.check_dimension(StatsIndex({"dimension": 768}))
+    intent_recognition.check_dimension(StatsIndex({"dimension": 256}))
+
+
+def test_unreachable_index_does_not_fail_startup(monkeypatch):
+    monkeypatch.setattr(intent_recognition, "EMBEDDING_DIM", 256)
+    intent_recognition.check_dimension(StatsIndex(ConnectionError("down")))
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pytest
+
+from src import jupiter
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(jupiter, "_negative", jupiter.OrderedDict())
+    monkeypatch.setattr(jupiter, "_late_found", jupiter.OrderedDict())
+    return monkeypatch
+
+
+def test_negative_cache_is_bounded(fresh):
+    fresh.setattr(jupiter, "JUPITER_CACHE_SIZE", 3)
+    for word in ("A", "B", "C", "D", "E"):
+        jupiter._remember(jupiter._negative, word)
+    assert list(jupiter._negative) == ["C", "D", "E"]
+
+
+def test_expired_entries_are_purged_on_insert(fresh):
+    fresh.setattr(jupiter, "JUPITER_NEGATIVE_TTL", -1)
+    jupiter._remember(jupiter._negative, "OLD")
+    fresh.setattr(jupiter, "JUPITER_NEGATIVE_TTL", 60)
+    jupiter._remember(jupiter._negative, "NEW")
+    assert list(jupiter._negative) == ["NEW"]
+
+
+def test_hit_after_the_budget_is_kept_for_the_next_query(fresh):
+    release = threading.Event()
+
+    def slow_search(symbol):
+        release.wait(2)
+        return True
+
+    fresh.setattr(jupiter, "search_jupiter_lite", slow_search)
+    assert jupiter.lookup_many(["bonks"], budget=0.01) == set()
+    release.set()
+    deadline = time.monotonic() + 2
+    while not jupiter._late_found and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert jupiter.lookup_many(["bonks"], budget=0.01) == {"BONKS"}
+    assert not jupiter._late_found
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+
+from src.resilience import CircuitBreaker, IndexUnavailable, ResilientIndex
+
+
+class FakeIndex:
+    """Answers with its call number; `behaviour(n)` may sleep or raise for call n (0-based)."""
+
+    def __init__(self, behaviour=lambda n: None):
+        self.behaviour = behaviour
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def query(self, **kwargs):
+        with self._lock:
+            n = len(self.calls)
+            self.calls.append(kwargs)
+        self.behaviour(n)
+        return n
+
+    def describe_index_stats(self):
+        return "passed through"
+
+
+def _index(behaviour, **kwargs):
+    fake = FakeIndex(behaviour)
+    kwargs.setdefault("deadline", 1.0)
+    kwargs.setdefault("hedge_min", 0.01)
+    return fake, ResilientIndex(fake, **kwargs)
+
+
+def test_fast_answer_passes_the_remaining_deadline_as_timeout():
+    fake, index = _index(lambda n: None, deadline=0.5)
+    assert index.query(vector=[0.0], top_k=1) == 0
+    assert 0 < fake.calls[0]["timeout"] <= 0.5
+    assert index.describe_index_stats() == "passed through"
+
+
+def test_slow_first_request_is_hedged():
+    def behaviour(n):
+        if n == 0:
+            time.sleep(0.3)
+
+    fake, index = _index(behaviour, deadline=1.0)
+    index._hedge_delay = lambda: 0.02
+    assert index.query(top_k=1) == 1
+    stats = index.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["retries"]) == (1, 1, 0)
+
+
+def test_failed_request_is_retried_once():
+    def behaviour(n):
+        if n == 0:
+            raise ConnectionError("reset")
+
+    fake, index = _index(behaviour)
+    assert index.query(top_k=1) == 1
+    assert index.stats()["retries"] == 1
+    assert index.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_two_failures_raise_index_unavailable():
+    def behaviour(n):
+        raise ConnectionError("down")
+
+    fake, index = _index(behaviour)
+    with pytest.raises(IndexUnavailable):
+        index.query(top_k=1)
+    assert len(fake.calls) == 2
+    assert index.stats()["errors"] == 1
+
+
+def test_deadline_is_enforced():
+    fake, index = _index(lambda n: time.sleep(0.5), deadline=0.1)
+    start = time.monotonic()
+    with pytest.raises(IndexUnavailable):
+        index.query(top_k=1)
+    assert time.monotonic() - start < 0.3
+    assert index.stats()["deadline_exceeded"] == 1
+
+
+def test_busy_threads_fail_fast_instead_of_queueing():
+    release = threading.Event()
+    fake, index = _index(lambda n: release.wait(2), deadline=0.05, workers=1)
+    with pytest.raises(IndexUnavailable):
+        index.query(top_k=1)  # leaves its call hanging on the only thread
+    start = time.monotonic()
+    with pytest.raises(IndexUnavailable, match="busy"):
+        index.query(top_k=1)
+    assert time.monotonic() - start < 0.02
+    assert index.stats()["saturated"] >= 1
+    release.set()
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failures=2, reset_after=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the single trial
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failures=1, reset_after=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+
+
+def test_open_breaker_short_circuits_queries():
+    fake, index = _index(lambda n: None, breaker=CircuitBreaker(failures=1, reset_after=60))
+    index.breaker.record_failure()
+    with pytest.raises(IndexUnavailable, match="circuit open"):
+        index.query(top_k=1)
+    assert fake.calls == []
+    assert index.stats()["short_circuited"] == 1
+
+
+def test_stats_count_every_query_under_concurrency():
+    # No hedges and spare threads, so a slow scheduler cannot add calls or trip the busy check.
+    fake, index = _index(lambda n: None, hedge_min=10, workers=64)
+    threads = [threading.Thread(target=lambda: [index.query(top_k=1) for _ in range(50)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert index.stats()["queries"] == 400
+    assert len(fake.calls) == 400
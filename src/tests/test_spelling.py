@@ -0,0 +1,75 @@
+import pytest
+
+from src import entities
+from src.spelling import SpellIndex, edit_distance, max_distance_for
+
+
+@pytest.fixture
+def jupiter(monkeypatch):
+    """Stub out the network: Jupiter knows exactly `known`, and every symbol it is asked about is recorded."""
+    class Stub:
+        known = set()
+        asked = []
+
+    def lookup_many(symbols, *a, **k):
+        symbols = [s.upper() for s in symbols]
+        Stub.asked.extend(symbols)
+        return set(symbols) & Stub.known
+
+    monkeypatch.setattr(entities, "lookup_many", lookup_many)
+    monkeypatch.setattr(entities, "save_token_to_cache", lambda symbol: None)
+    return Stub
+
+
+def test_edit_distance_counts_adjacent_swaps_once():
+    assert edit_distance("BONK", "BOKN") == 1
+    assert edit_distance("USDC", "USDCC") == 1
+    assert edit_distance("ETHEREUM", "ETHERIUM") == 1
+
+
+def test_distance_budget_grows_with_word_length():
+    assert [max_distance_for(w) for w in ("sol", "bokn", "usdcc", "etherium")] == [0, 1, 1, 2]
+    assert SpellIndex(["BONK"]).lookup("bokn").symbol == "BONK"
+
+
+def test_lookup_maps_synonyms_and_scores_by_the_shorter_word():
+    index = SpellIndex(["ETH", "BTC"], {"ETHEREUM": "ETH", "BITCOIN": "BTC"})
+    correction = index.lookup("etherium")
+    assert correction.symbol == "ETH"
+    assert correction.distance == 1
+    assert correction.confidence == pytest.approx(1 - 1 / 8)
+
+
+def test_ties_between_symbols_split_the_confidence():
+    correction = SpellIndex(["USDCX", "USDTX"]).lookup("USDXX")
+    assert correction.confidence == pytest.approx((1 - 1 / 5) / 2)
+
+
+@pytest.mark.parametrize("word, symbol", [("usdcc", "USDC"), ("bokn", "BONK"), ("etherium", "ETH")])
+def test_typos_resolve_without_the_network(jupiter, word, symbol):
+    match = entities.resolve_token(word)
+    assert (match.symbol, match.distance) == (symbol, 1)
+    assert jupiter.asked == []
+
+
+def test_exact_tickers_in_the_index_are_never_corrected(jupiter):
+    # "WIFE" is one edit from WIF, but it is a listed token of its own.
+    assert entities.is_known_token("WIFE")
+    match = entities.resolve_token("wife")
+    assert (match.symbol, match.distance) == ("WIFE", 0)
+
+
+def test_query_corrects_typos_locally_and_asks_jupiter_only_for_the_rest(jupiter):
+    jupiter.known.add("ZQXWV")
+    q = entities.ParsedQuery("swap 1 usdcc to bokn, zqxwv")
+    assert q.tokens == ["1", "USDC", "BONK", "ZQXWV"]
+    assert sorted(q.corrections) == ["BOKN", "USDCC"]
+    assert jupiter.asked == ["ZQXWV"]
+
+
+def test_record_remembers_a_resolution_for_the_query(jupiter):
+    q = entities.ParsedQuery("swap 1 sol to zzzzz")
+    q.record("zzzzz", None)
+    assert q.resolve("ZZZZZ") is None
+    q.record("bonks", entities.Correction("BONKS", 0, 1.0))
+    assert q.is_token("bonks")
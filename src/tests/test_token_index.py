@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from src.token_index import TokenIndex, build_index, open_index
+
+
+TOKENS = [
+    {"symbol": "bonk", "address": "BonkMintWithoutGecko", "decimals": 5},
+    {"symbol": "BONK", "address": "BonkMint", "decimals": 5,
+     "extensions": {"coingeckoId": "bonk"}, "logoURI": "https://example.com/bonk.png"},
+    {"symbol": "SOL", "address": "So11111111111111111111111111111111111111112", "decimals": 9},
+    {"symbol": "ÜBER", "address": "UberMint", "decimals": 300},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = os.path.join(tmp_path, "tokens.idx")
+    assert build_index(TOKENS, path, extra_symbols=["jup"]) == 4
+    index = TokenIndex(path)
+    yield index
+    index.close()
+
+
+def test_symbols_are_found_case_insensitively(index):
+    assert "sol" in index and "JUP" in index and "ÜBER" in index
+    assert "RAY" not in index
+    assert list(index.symbols()) == ["BONK", "JUP", "SOL", "ÜBER"]
+
+
+def test_the_coingecko_listed_mint_is_the_primary_one(index):
+    info = index.get("bonk")
+    assert (info.mint, info.decimals, info.coingecko_id) == ("BonkMint", 5, "bonk")
+    assert info.logo == "https://example.com/bonk.png"
+    assert list(index.symbols(coingecko_only=True)) == ["BONK"]
+
+
+def test_every_mint_maps_back_to_its_symbol(index):
+    assert index.symbol_for_mint("BonkMintWithoutGecko") == "BONK"
+    assert index.symbol_for_mint("So11111111111111111111111111111111111111112") == "SOL"
+    assert index.symbol_for_mint("Unknown") is None
+
+
+def test_missing_fields_read_back_as_none(index):
+    jup = index.get("JUP")
+    assert (jup.mint, jup.decimals, jup.coingecko_id, jup.logo) == (None, None, None, None)
+    assert index.get("ÜBER").decimals is None  # out of range
+
+
+def test_open_index_rejects_missing_and_foreign_files(tmp_path):
+    assert open_index(os.path.join(tmp_path, "missing.idx")) is None
+    path = os.path.join(tmp_path, "garbage.idx")
+    with open(path, "wb") as f:
+        f.write(b"not an index at all")
+    assert open_index(path) is None
+
+
+def test_startup_with_an_index_never_parses_tokens_json(index, monkeypatch):
+    from src import entities
+    monkeypatch.setattr(entities, "open_index", lambda path: index)
+    monkeypatch.setattr(entities, "_read_token_file", lambda: pytest.fail("tokens.json was parsed"))
+    monkeypatch.setattr(entities, "read_discoveries", lambda: ["POPCAT"])
+    loaded, tokens, _ = entities._load_token_state()
+    assert loaded is index
+    assert tokens == entities.BUILTIN_TOKENS | {"POPCAT"}
+
+
+def test_a_rebuild_leaves_open_readers_on_the_old_file(index, tmp_path):
+    build_index([{"symbol": "RAY", "address": "RayMint"}], index.path)
+    assert "SOL" in index and "RAY" not in index
+    fresh = TokenIndex(index.path)
+    try:
+        assert list(fresh.symbols()) == ["RAY"]
+    finally:
+        fresh.close()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
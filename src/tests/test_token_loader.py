@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from src.token_loader import iter_array_items
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+DOCUMENT = json.dumps({
+    "name": "list", "tokens": [{"symbol": "SOL"}, {"symbol": "BONK", "name": "Bonk ☀"}, {"symbol": "JUP"}],
+    "version": 1,
+}, ensure_ascii=False).encode("utf-8")
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(DOCUMENT)])
+def test_items_survive_any_chunk_boundary(size):
+    # Size 1 also splits the multi-byte "☀" and the "tokens" key.
+    items = list(iter_array_items(_chunks(DOCUMENT, size)))
+    assert [t["symbol"] for t in items] == ["SOL", "BONK", "JUP"]
+    assert items[1]["name"] == "Bonk ☀"
+
+
+def test_missing_key_and_truncated_array_are_errors():
+    with pytest.raises(ValueError, match='No "tokens" array'):
+        list(iter_array_items([b'{"items": []}']))
+    with pytest.raises(ValueError, match="ended inside"):
+        list(iter_array_items(_chunks(DOCUMENT[:40], 8)))
+
+
+class _Response:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return _chunks(self.body, 5)
+
+
+@pytest.fixture
+def token_files(tmp_path, monkeypatch):
+    from src import token_loader, token_store
+    real_lock = token_store.file_lock
+    monkeypatch.setattr(token_loader, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(token_loader, "TOKENS_FILE", os.path.join(tmp_path, "tokens.json"))
+    monkeypatch.setattr(token_loader, "TOKENS_META_FILE", os.path.join(tmp_path, "tokens.meta.json"))
+    monkeypatch.setattr(token_loader, "TOKEN_INDEX_FILE", os.path.join(tmp_path, "tokens.idx"))
+    monkeypatch.setattr(token_loader, "file_lock", lambda: real_lock(os.path.join(tmp_path, "tokens.lock")))
+    monkeypatch.setattr(token_loader, "bump_generation", lambda: None)
+    return token_loader
+
+
+def test_refresh_is_conditional_and_reports_the_diff(token_files, monkeypatch):
+    sent = []
+
+    def get(url, headers=None, stream=False, timeout=None):
+        sent.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return _Response(304)
+        return _Response(200, DOCUMENT, {"ETag": '"v1"'})
+
+    monkeypatch.setattr(token_files.requests, "get", get)
+    first = token_files.update_token_list()
+    assert (first["added"], first["total"]) == (["BONK", "JUP", "SOL"], 3)
+    assert token_files.update_token_list() == {"modified": False, "added": [], "removed": [], "total": None}
+    assert token_files.update_token_list(force=True)["added"] == []
+    assert sent == [{}, {"If-None-Match": '"v1"'}, {}]
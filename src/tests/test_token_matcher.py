@@ -0,0 +1,25 @@
+from src.token_matcher import TokenMatcher, normalize_phrase
+
+
+def test_longest_pattern_wins_on_word_boundaries():
+    matcher = TokenMatcher(["SOL", "MSOL", "USDC"], {"USD COIN": "USDC", "WRAPPED SOL": "SOL"})
+    spans = matcher.find(normalize_phrase("swap  wrapped sol for usd coin and msol"))
+    assert [(s.text, s.symbol) for s in spans] == [("WRAPPED SOL", "SOL"), ("USD COIN", "USDC"), ("MSOL", "MSOL")]
+
+
+def test_patterns_inside_words_are_not_matched():
+    matcher = TokenMatcher(["SOL", "RAY"])
+    assert matcher.find("SOLANA CONSOLE RAYS") == []
+
+
+def test_punctuation_in_symbols():
+    matcher = TokenMatcher(["$WIF", "WIF"])
+    spans = matcher.find("BUY $WIF NOT WIF2")
+    assert [(s.start, s.symbol) for s in spans] == [(4, "$WIF")]
+
+
+def test_synonym_overrides_a_symbol_with_the_same_spelling():
+    matcher = TokenMatcher(["ETHER"], {"ETHER": "ETH"})
+    assert [s.symbol for s in matcher.find("ETHER")] == ["ETH"]
+    assert matcher.size == 1
+    assert "ether" in matcher and "ETHE" not in matcher
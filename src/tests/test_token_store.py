@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from src import token_store
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    lock = os.path.join(tmp_path, "tokens.lock")
+    real_lock = token_store.file_lock
+    monkeypatch.setattr(token_store, "file_lock", lambda: real_lock(lock))
+    tokens = os.path.join(tmp_path, "tokens.json")
+    journal = os.path.join(tmp_path, "tokens.journal")
+    discovered = os.path.join(tmp_path, "tokens.discovered")
+    return tokens, journal, discovered
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_compaction_folds_the_journal_into_the_symbol_list(files):
+    tokens, journal, discovered = files
+    _write(tokens, json.dumps(["SOL", "BONK"]))
+    _write(journal, "WIF\nBONK\nWIF\n\nPOPCAT\n")
+    assert token_store.compact(tokens, journal, discovered) == 2
+    with open(tokens) as f:
+        assert json.load(f) == ["BONK", "POPCAT", "SOL", "WIF"]
+    assert token_store.read_journal(journal) == []
+    assert token_store.read_discoveries(discovered, journal) == ["WIF", "BONK", "POPCAT"]
+    assert not [name for name in os.listdir(os.path.dirname(tokens)) if name.endswith(".tmp")]
+
+
+def test_compaction_creates_a_missing_list_and_skips_an_empty_journal(files):
+    tokens, journal, discovered = files
+    assert token_store.compact(tokens, journal, discovered) == 0
+    assert not os.path.exists(tokens)
+    _write(journal, "WIF\n")
+    assert token_store.compact(tokens, journal, discovered) == 1
+    with open(tokens) as f:
+        assert json.load(f) == ["WIF"]
+
+
+def test_compaction_leaves_a_non_list_file_alone(files):
+    tokens, journal, discovered = files
+    _write(tokens, json.dumps({"tokens": ["SOL"]}))
+    _write(journal, "WIF\n")
+    assert token_store.compact(tokens, journal, discovered) == 0
+    with open(tokens) as f:
+        assert json.load(f) == {"tokens": ["SOL"]}
+    assert token_store.read_journal(journal) == ["WIF"]
+
+
+def test_generation_starts_at_zero_and_counts_refreshes(tmp_path):
+    path = os.path.join(tmp_path, "tokens.generation")
+    assert token_store.read_generation(path) == 0
+    assert token_store.bump_generation(path) == 1
+    assert token_store.bump_generation(path) == 2
+    assert token_store.read_generation(path) == 2
+
+
+def test_discoveries_outlive_a_rewritten_token_list(files):
+    tokens, journal, discovered = files
+    _write(journal, "WIF\n")
+    token_store.compact(tokens, journal, discovered)
+    _write(tokens, json.dumps(["SOL"]))  # a refresh replaces tokens.json
+    _write(journal, "WIF\nPOPCAT\n")
+    token_store.compact(tokens, journal, discovered)
+    assert token_store.read_discoveries(discovered, journal) == ["WIF", "POPCAT"]
+
+
+def test_a_discovery_is_one_journal_line_and_schedules_compaction(files, monkeypatch):
+    _, journal, discovered = files
+    scheduled = []
+    monkeypatch.setattr(token_store, "schedule_compaction", lambda: scheduled.append(True))
+    token_store.append_discovery("WIF", journal)
+    token_store.append_discovery("POPCAT", journal)
+    assert token_store.read_journal(journal) == ["WIF", "POPCAT"]
+    assert token_store.read_discoveries(discovered, journal) == ["WIF", "POPCAT"]
+    assert scheduled == [True, True]
@@ -0,0 +1,205 @@
+import os
+import mmap
+import struct
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+
+
+MAGIC = b"BLTKIDX1"
+
+# magic, n_symbols, n_mints, strings offset
+_HEADER = struct.Struct("<8sIII")
+# symbol, coingecko id, logo, mint as (offset, length) into the string blob, then decimals
+_SYMBOL = struct.Struct("<IHIHIHIHB")
+# mint (offset, length), row in the symbol table
+_MINT = struct.Struct("<IHI")
+
+NO_DECIMALS = 255
+
+
+class TokenInfo(NamedTuple):
+    symbol: str
+    mint: Optional[str]
+    decimals: Optional[int]
+    coingecko_id: Optional[str]
+    logo: Optional[str]
+
+
+def _pick(entries):
+    # Several mints share a symbol; the one CoinGecko knows is the one people mean.
+    for entry in entries:
+        if (entry.get("extensions") or {}).get("coingeckoId"):
+            return entry
+    return entries[0]
+
+
+def build_index(tokens: Iterable[dict], path: str, extra_symbols: Iterable[str] = ()) -> int:
+    """
+    Compile token-list entries into the binary index at `path`.
+
+    The file holds a sorted symbol table, a sorted mint table and one string
+    blob, so readers can mmap it and binary-search without parsing anything.
+    The file is written next to `path` and renamed over it. Returns the
+    number of symbols.
+    """
+    by_symbol: Dict[str, list] = {}
+    for token in tokens:
+        symbol = (token.get("symbol") or "").upper().strip()
+        if symbol:
+            by_symbol.setdefault(symbol, []).append(token)
+    for symbol in extra_symbols:
+        by_symbol.setdefault(symbol.upper().strip(), [{}])
+    by_symbol.pop("", None)
+
+    blob = bytearray()
+    strings = {}
+
+    def intern(value) -> tuple:
+        if not value:
+            return 0, 0
+        data = str(value).encode("utf-8")[:0xFFFF]
+        if data not in strings:
+            strings[data] = len(blob)
+            blob.extend(data)
+        return strings[data], len(data)
+
+    symbols = sorted(by_symbol, key=lambda s: s.encode("utf-8"))
+    symbol_rows = bytearray()
+    mints = []
+    for row, symbol in enumerate(symbols):
+        entries = by_symbol[symbol]
+        primary = _pick(entries)
+        decimals = primary.get("decimals")
+        symbol_rows += _SYMBOL.pack(
+            *intern(symbol),
+            *intern((primary.get("extensions") or {}).get("coingeckoId")),
+            *intern(primary.get("logoURI")),
+            *intern(primary.get("address")),
+            decimals if isinstance(decimals, int) and 0 <= decimals < NO_DECIMALS else NO_DECIMALS,
+        )
+        for entry in entries:
+            if entry.get("address"):
+                mints.append((entry["address"].encode("utf-8"), row))
+
+    mints = sorted(dict(mints).items())
+    mint_rows = bytearray()
+    for mint, row in mints:
+        mint_rows += _MINT.pack(*intern(mint.decode("utf-8")), row)
+
+    strings_offset = _HEADER.size + len(symbol_rows) + len(mint_rows)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(symbols), len(mints), strings_offset))
+        f.write(symbol_rows)
+        f.write(mint_rows)
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(symbols)
+
+
+class TokenIndex:
+    """
+    Read-only view of a file written by `build_index`.
+
+    The file is memory-mapped, so every process that opens it shares the
+    same pages. Symbol and mint lookups are binary searches over fixed-size
+    records (O(log n)); nothing is copied into Python objects up front.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mtime = os.fstat(f.fileno()).st_mtime
+        if len(self._mm) < _HEADER.size:
+            self._mm.close()
+            raise ValueError(f"{path} is not a token index")
+        magic, self.n_symbols, self.n_mints, self._strings = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a token index")
+        self._mints = _HEADER.size + self.n_symbols * _SYMBOL.size
+
+    def close(self):
+        self._mm.close()
+
+    def __len__(self):
+        return self.n_symbols
+
+    def _string(self, offset: int, length: int) -> bytes:
+        start = self._strings + offset
+        return self._mm[start:start + length]
+
+    def _symbol_row(self, row: int):
+        return _SYMBOL.unpack_from(self._mm, _HEADER.size + row * _SYMBOL.size)
+
+    def _find_symbol(self, symbol: str) -> int:
+        key = symbol.upper().encode("utf-8")
+        lo, hi = 0, self.n_symbols
+        while lo < hi:
+            mid = (lo + hi) // 2
+            rec = self._symbol_row(mid)
+            value = self._string(rec[0], rec[1])
+            if value < key:
+                lo = mid + 1
+            elif value > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def __contains__(self, symbol: str) -> bool:
+        return self._find_symbol(symbol) >= 0
+
+    def _info(self, row: int) -> TokenInfo:
+        s_off, s_len, c_off, c_len, l_off, l_len, m_off, m_len, decimals = self._symbol_row(row)
+
+        def text(offset, length):
+            return self._string(offset, length).decode("utf-8") if length else None
+
+        return TokenInfo(
+            symbol=text(s_off, s_len),
+            mint=text(m_off, m_len),
+            decimals=None if decimals == NO_DECIMALS else decimals,
+            coingecko_id=text(c_off, c_len),
+            logo=text(l_off, l_len),
+        )
+
+    def get(self, symbol: str) -> Optional[TokenInfo]:
+        row = self._find_symbol(symbol)
+        return self._info(row) if row >= 0 else None
+
+    def symbol_for_mint(self, mint: str) -> Optional[str]:
+        key = mint.encode("utf-8")
+        lo, hi = 0, self.n_mints
+        while lo < hi:
+            mid = (lo + hi) // 2
+            m_off, m_len, row = _MINT.unpack_from(self._mm, self._mints + mid * _MINT.size)
+            value = self._string(m_off, m_len)
+            if value < key:
+                lo = mid + 1
+            elif value > key:
+                hi = mid
+            else:
+                rec = self._symbol_row(row)
+                return self._string(rec[0], rec[1]).decode("utf-8")
+        return None
+
+    def symbols(self, coingecko_only: bool = False) -> Iterator[str]:
+        """All symbols, or only those with a CoinGecko id (the ones worth correcting typos towards)."""
+        for row in range(self.n_symbols):
+            rec = self._symbol_row(row)
+            if coingecko_only and not rec[3]:
+                continue
+            yield self._string(rec[0], rec[1]).decode("utf-8")
+
+
+def open_index(path: str) -> Optional[TokenIndex]:
+    """Open the index at `path`, or return None if it is missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return TokenIndex(path)
+    except (OSError, ValueError) as e:
+        print(f"Failed to open token index: {e}")
+        return None
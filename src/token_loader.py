@@ -2,38 +2,154 @@ import requests
 import json
 import re
 import os
+import sys
+import time
+import codecs
 import argparse
+from typing import Iterable, Iterator
 
 # Data folder in the parent directory (cd ..)
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 TOKENS_FILE = os.path.join(DATA_DIR, "tokens.json")
+TOKENS_META_FILE = os.path.join(DATA_DIR, "tokens.meta.json")
+
+sys.path.append(PROJECT_ROOT)
+
+from src.config import TOKEN_INDEX_FILE
+from src.token_index import build_index
+from src.token_store import bump_generation, file_lock
 
 TOKEN_LIST_URL = "https://raw.githubusercontent.com/solana-labs/token-list/main/src/tokens/solana.tokenlist.json"
+HTTP_TIMEOUT = (10, 60)  # connect, read
+CHUNK_SIZE = 64 * 1024
+_SKIP = re.compile(r"[\s,]*")
 STOPWORDS = {"can", "you", "swap", "some", "to", "for", "a", "the", "me", "please", "on"}
 
 
-def update_token_list():
-    """Download Solana token list and save only symbols to tokens.json"""
+def iter_array_items(chunks: Iterable[bytes], key: str = "tokens") -> Iterator[dict]:
+    """
+    Yield the items of the top-level JSON array `key` as they arrive, so the
+    multi-megabyte token list is never held in memory as one document.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buf, pos, in_array = "", 0, False
+
+    for chunk in chunks:
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        if not in_array:
+            match = start.search(buf)
+            if not match:
+                # Keep a tail in case the key is split across chunks.
+                buf = buf[-(len(key) + 16):]
+                continue
+            pos, in_array = match.end(), True
+
+        while True:
+            pos = _SKIP.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # item continues in the next chunk
+            yield item
+
+    if in_array:
+        raise ValueError("Token list ended inside the token array")
+    raise ValueError(f'No "{key}" array in token list')
+
+
+def _slim(token: dict) -> dict:
+    # Only what tokens.json and the binary index use.
+    return {
+        "symbol": token.get("symbol"),
+        "address": token.get("address"),
+        "decimals": token.get("decimals"),
+        "logoURI": token.get("logoURI"),
+        "extensions": {"coingeckoId": (token.get("extensions") or {}).get("coingeckoId")},
+    }
+
+
+def _load_meta() -> dict:
+    try:
+        with open(TOKENS_META_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: str, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def update_token_list(force: bool = False) -> dict:
+    """
+    Download Solana token list, save symbols to tokens.json and compile the binary index.
+
+    The request is conditional (ETag / Last-Modified from the previous
+    refresh) unless `force` is set, and the body is parsed as it streams in.
+    Returns the diff against the previous symbol list.
+    """
     print("Updating token list...")
-    resp = requests.get(TOKEN_LIST_URL)
-    data = resp.json()
-
-    tokens = sorted(set(token["symbol"].upper() for token in data["tokens"]))
+    headers = {}
+    meta = {} if force or not os.path.exists(TOKENS_FILE) else _load_meta()
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    with requests.get(TOKEN_LIST_URL, headers=headers, stream=True, timeout=HTTP_TIMEOUT) as resp:
+        if resp.status_code == 304:
+            print("Token list not modified.")
+            return {"modified": False, "added": [], "removed": [], "total": None}
+        resp.raise_for_status()
+        entries = [_slim(t) for t in iter_array_items(resp.iter_content(chunk_size=CHUNK_SIZE)) if t.get("symbol")]
+        meta = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+
+    tokens = sorted(set(token["symbol"].upper() for token in entries))
+    try:
+        previous = set(load_tokens_file())
+    except (OSError, ValueError):
+        previous = set()
 
     os.makedirs(DATA_DIR, exist_ok=True)
-    with open(TOKENS_FILE, "w") as f:
-        json.dump(tokens, f, indent=2)
-
-    print(f"Saved {len(tokens)} tokens to {TOKENS_FILE}")
+    with file_lock():
+        _write_atomic(TOKENS_FILE, tokens)
+        # Written after tokens.json so the index is never older than the symbol list.
+        count = build_index(entries, TOKEN_INDEX_FILE)
+        bump_generation()
+    _write_atomic(TOKENS_META_FILE, meta)
+
+    added = sorted(set(tokens) - previous)
+    removed = sorted(previous - set(tokens))
+    print(f"Saved {len(tokens)} tokens to {TOKENS_FILE} and compiled {count} into {TOKEN_INDEX_FILE}")
+    print(f"+{len(added)} / -{len(removed)} symbols since the last refresh")
+    if added:
+        print("Added:", ", ".join(added[:20]) + (" ..." if len(added) > 20 else ""))
+    if removed:
+        print("Removed:", ", ".join(removed[:20]) + (" ..." if len(removed) > 20 else ""))
+    return {"modified": True, "added": added, "removed": removed, "total": len(tokens)}
+
+
+def load_tokens_file():
+    with open(TOKENS_FILE) as f:
+        return json.load(f)
 
 
 def load_tokens():
     """Load token symbols from file (update if not exists)"""
     if not os.path.exists(TOKENS_FILE):
         update_token_list()
-    with open(TOKENS_FILE) as f:
-        return set(json.load(f))
+    return set(load_tokens_file())
 
 
 def detect_tokens(user_input, tokens):
@@ -67,10 +183,21 @@ def process_query(query, tokens):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--refresh", action="store_true", help="Refresh token list and exit")
+    parser.add_argument("--force", action="store_true", help="Download even if the list has not changed")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Keep refreshing every SECONDS")
     args = parser.parse_args()
 
+    if args.watch:
+        # Running servers pick up each refresh on their own (TOKEN_RELOAD_INTERVAL).
+        while True:
+            try:
+                update_token_list(force=args.force)
+            except Exception as e:
+                print(f"Token refresh failed: {e}")
+            time.sleep(args.watch)
+
     if args.refresh:
-        update_token_list()
+        update_token_list(force=args.force)
         exit(0)
 
     tokens = load_tokens()
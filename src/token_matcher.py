@@ -0,0 +1,88 @@
+from typing import Dict, Iterable, List, NamedTuple
+
+
+_END = "\0"
+
+
+class TokenSpan(NamedTuple):
+    start: int
+    end: int
+    text: str
+    symbol: str
+
+
+def normalize_phrase(text: str) -> str:
+    """Upper-case and collapse whitespace, the form both patterns and queries are matched in."""
+    return " ".join(text.upper().split())
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum()
+
+
+class TokenMatcher:
+    """
+    Character trie over token symbols and synonyms.
+
+    `find` scans the text once, taking the longest pattern that starts and
+    ends on a word boundary at each position. Patterns may contain spaces
+    ("USD COIN") or punctuation ("$BONK"), which word-by-word matching
+    cannot handle.
+    """
+
+    def __init__(self, symbols: Iterable[str] = (), synonyms: Dict[str, str] = None):
+        self._root = {}
+        self.size = 0
+        for symbol in symbols:
+            self.add(symbol)
+        # Synonyms go last so they win over a symbol with the same spelling.
+        for phrase, symbol in (synonyms or {}).items():
+            self.add(phrase, symbol)
+
+    def add(self, phrase: str, symbol: str = None):
+        key = normalize_phrase(phrase)
+        if not key:
+            return
+        node = self._root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        if _END not in node:
+            self.size += 1
+        node[_END] = normalize_phrase(symbol) if symbol else key
+
+    def __contains__(self, phrase: str) -> bool:
+        node = self._root
+        for ch in normalize_phrase(phrase):
+            node = node.get(ch)
+            if node is None:
+                return False
+        return _END in node
+
+    def find(self, text: str) -> List[TokenSpan]:
+        """All non-overlapping token spans in `text`, which must already be normalized."""
+        spans = []
+        n = len(text)
+        i = 0
+        while i < n:
+            if i > 0 and _is_word_char(text[i - 1]):
+                i += 1
+                continue
+
+            node = self._root
+            j = i
+            best = None
+            while j < n:
+                node = node.get(text[j])
+                if node is None:
+                    break
+                j += 1
+                if _END in node and (j == n or not _is_word_char(text[j])):
+                    best = (j, node[_END])
+
+            if best:
+                end, symbol = best
+                spans.append(TokenSpan(i, end, text[i:end], symbol))
+                i = end
+            else:
+                i += 1
+        return spans
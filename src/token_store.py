@@ -0,0 +1,159 @@
+import os
+import json
+import threading
+import atexit
+from contextlib import contextmanager
+from typing import List
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+from src.config import DATA_DIR, TOKEN_COMPACT_DELAY
+
+
+TOKENS_FILE = os.path.join(DATA_DIR, "tokens.json")
+JOURNAL_FILE = os.path.join(DATA_DIR, "tokens.journal")
+# Every discovery compaction has folded in, one per line. Small, so
+# processes that use the binary index read it instead of tokens.json.
+DISCOVERED_FILE = os.path.join(DATA_DIR, "tokens.discovered")
+LOCK_FILE = os.path.join(DATA_DIR, "tokens.lock")
+# Bumped whenever the token list is replaced by a refresh. Compaction only
+# folds in discoveries and leaves it alone, so readers don't reload for it.
+GENERATION_FILE = os.path.join(DATA_DIR, "tokens.generation")
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: str = LOCK_FILE):
+    """Exclusive advisory lock shared by every process using the same data dir."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def read_generation(path: str = GENERATION_FILE) -> int:
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_generation(path: str = GENERATION_FILE) -> int:
+    """Mark the token files as replaced. Call with `file_lock()` held."""
+    generation = read_generation(path) + 1
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(f"{generation}\n")
+    os.replace(tmp, path)
+    return generation
+
+
+def read_journal(path: str = JOURNAL_FILE) -> List[str]:
+    try:
+        with open(path, "r") as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def read_discoveries(discovered_file: str = DISCOVERED_FILE, journal_file: str = JOURNAL_FILE) -> List[str]:
+    """All symbols found through the fallback: compacted ones, then those still in the journal."""
+    return read_journal(discovered_file) + read_journal(journal_file)
+
+
+def _write_lines(path: str, lines: List[str]):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.writelines(line + "\n" for line in lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def append_discovery(symbol: str, path: str = JOURNAL_FILE):
+    """Record a newly discovered symbol. One short append; tokens.json is rewritten later."""
+    with file_lock():
+        with open(path, "a") as f:
+            f.write(symbol + "\n")
+    schedule_compaction()
+
+
+def compact(tokens_file: str = TOKENS_FILE, journal_file: str = JOURNAL_FILE,
+            discovered_file: str = DISCOVERED_FILE) -> int:
+    """
+    Fold the journal into the discovered-symbols file and tokens.json. New
+    files are written next to the old ones and renamed over them, so readers
+    never see a partial file. Returns the number of symbols added to
+    tokens.json.
+    """
+    with file_lock():
+        journal = read_journal(journal_file)
+        if not journal:
+            return 0
+        discovered = read_journal(discovered_file)
+        known = set(discovered)
+        new = [s for s in dict.fromkeys(journal) if s not in known]
+        if new:
+            _write_lines(discovered_file, discovered + new)
+        try:
+            with open(tokens_file, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = []
+        if not isinstance(data, list):
+            print(f"{tokens_file} is not a symbol list, leaving it untouched")
+            return 0
+        tokens = set(data)
+
+        added = {s for s in journal if s not in tokens}
+        if added:
+            tmp = f"{tokens_file}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(sorted(tokens | added), f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, tokens_file)
+        open(journal_file, "w").close()
+        return len(added)
+
+
+def _run_compaction():
+    global _timer
+    with _timer_lock:
+        _timer = None
+    try:
+        compact()
+    except Exception as e:
+        print(f"Token cache compaction failed: {e}")
+
+
+def schedule_compaction(delay: float = TOKEN_COMPACT_DELAY):
+    """Compact in the background after `delay` seconds, batching discoveries made meanwhile."""
+    global _timer
+    with _timer_lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(delay, _run_compaction)
+        _timer.daemon = True
+        _timer.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    global _timer
+    with _timer_lock:
+        timer, _timer = _timer, None
+    if timer is not None:
+        timer.cancel()
+        _run_compaction()
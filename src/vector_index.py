@@ -0,0 +1,177 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+
+from src.embedding_cache import normalize_query
+
+# Bumped whenever the text handed to the model changes, so cached vectors are re-encoded.
+TEXT_FORM = "normalize_query"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def example_id(intent: str, example: str) -> str:
+    """Stable vector ID derived from the example's content, not its position in the file."""
+    digest = hashlib.sha256(f"{intent}\x00{example}".encode("utf-8")).hexdigest()
+    return f"{intent}_{digest[:16]}"
+
+
+def load_examples(filepath: str):
+    """Flatten upsert.json into parallel (ids, intents, texts) lists, dropping duplicates."""
+    with open(filepath, "r") as f:
+        intents = json.load(f)
+
+    ids, labels, texts = [], [], []
+    seen = set()
+    for intent, examples in intents.items():
+        for example in examples:
+            vid = example_id(intent, example)
+            if vid in seen:
+                continue
+            seen.add(vid)
+            ids.append(vid)
+            labels.append(intent)
+            texts.append(example)
+    return ids, labels, texts
+
+
+def _fingerprint(filepath: str, model_name: str) -> str:
+    h = hashlib.sha256(model_name.encode("utf-8"))
+    h.update(TEXT_FORM.encode("utf-8"))
+    with open(filepath, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+def query_many(index, vectors, top_k: int = 1, workers: int = 8):
+    """
+    Query several vectors at once. The local index answers them with a single
+    matrix product; Pinecone has no multi-vector query, so its requests are
+    issued concurrently instead. Results follow the order of `vectors`.
+    """
+    if hasattr(index, "query_many"):
+        return index.query_many(vectors, top_k=top_k, include_metadata=True)
+
+    vectors = [np.asarray(v).tolist() for v in vectors]
+    if len(vectors) <= 1:
+        return [index.query(vector=v, top_k=top_k, include_metadata=True) for v in vectors]
+    with ThreadPoolExecutor(max_workers=min(workers, len(vectors))) as pool:
+        return list(pool.map(lambda v: index.query(vector=v, top_k=top_k, include_metadata=True), vectors))
+
+
+class LocalIndex:
+    """
+    In-process replacement for the Pinecone index.
+
+    Holds the training examples as a row-normalized float32 matrix, so a
+    cosine top-k search is a single matrix-vector product. `query` returns
+    the same shape as Pinecone's response, so callers do not need to care
+    which backend they are talking to.
+    """
+
+    def __init__(self, ids: List[str], intents: List[str], vectors: np.ndarray):
+        self.ids = list(ids)
+        self.intents = list(intents)
+        self.vectors = _normalize(vectors) if len(self.ids) else np.zeros((0, 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, vector, top_k: int = 1):
+        """Return (row indices, cosine scores) of the top_k nearest examples."""
+        if not len(self.ids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self.vectors @ _normalize(vector)[0]
+        k = min(top_k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def search_many(self, vectors, top_k: int = 1):
+        """Batched `search`: one matrix product for all query vectors."""
+        queries = _normalize(vectors)
+        if not len(self.ids):
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        scores = queries @ self.vectors.T
+        k = min(top_k, scores.shape[1])
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def _matches(self, rows, scores, include_metadata: bool):
+        matches = []
+        for row, score in zip(rows, scores):
+            match = {"id": self.ids[row], "score": float(score)}
+            if include_metadata:
+                match["metadata"] = {"intent": self.intents[row]}
+            matches.append(match)
+        return {"matches": matches}
+
+    def query(self, vector, top_k: int = 1, include_metadata: bool = True, **kwargs):
+        rows, scores = self.search(vector, top_k)
+        return self._matches(rows, scores, include_metadata)
+
+    def query_many(self, vectors, top_k: int = 1, include_metadata: bool = True):
+        rows, scores = self.search_many(vectors, top_k)
+        return [self._matches(r, s, include_metadata) for r, s in zip(rows, scores)]
+
+    def save(self, filepath: str, fingerprint: str = ""):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp = filepath + ".tmp.npz"
+        np.savez(
+            tmp,
+            ids=np.array(self.ids),
+            intents=np.array(self.intents),
+            vectors=self.vectors,
+            fingerprint=np.array(fingerprint),
+        )
+        os.replace(tmp, filepath)
+
+    @classmethod
+    def build(cls, examples_file: str, encode: Callable[[List[str]], np.ndarray]):
+        ids, intents, texts = load_examples(examples_file)
+        # Same form as a query, so a training example and its identical query embed identically.
+        vectors = encode([normalize_query(t) for t in texts]) if texts else np.zeros((0, 0))
+        return cls(ids, intents, vectors)
+
+    @classmethod
+    def load(cls, examples_file: str, cache_file: str, encode: Callable[[List[str]], np.ndarray], model_name: str = ""):
+        """
+        Load the persisted example embeddings, re-encoding (and re-saving)
+        them only when upsert.json or the model changed since they were written.
+        """
+        fingerprint = _fingerprint(examples_file, model_name)
+        if os.path.exists(cache_file):
+            try:
+                with np.load(cache_file) as data:
+                    if str(data["fingerprint"]) == fingerprint:
+                        return cls(data["ids"].tolist(), data["intents"].tolist(), data["vectors"])
+            except Exception as e:
+                print(f"Failed to load local index cache: {e}")
+
+        print("Encoding training examples for the local index...")
+        index = cls.build(examples_file, encode)
+        try:
+            index.save(cache_file, fingerprint)
+        except OSError as e:
+            print(f"Failed to save local index cache: {e}")
+        return index